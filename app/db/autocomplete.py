@@ -0,0 +1,116 @@
+from bisect import insort
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.catalog import CatalogSnapshot, StoryEntry, catalog
+from app.db.matcher import normalize_text
+
+# Liczba najlepiej ocenianych historii zapamiętana w każdym węźle drzewa
+MAX_SUGGESTIONS = 10
+
+
+def _rank(story: StoryEntry) -> Tuple[float, int]:
+    # Najwyższa ocena pierwsza, historie bez oceny na końcu, remisy według id
+    rating = story.rating if story.rating is not None else float("-inf")
+    return -rating, story.id
+
+
+class _TrieNode:
+    __slots__ = ("children", "top")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.top: List[Tuple[Tuple[float, int], StoryEntry]] = []
+
+
+class TitleTrie:
+    """
+    Prefix tree over normalized story titles.
+
+    Every word of a title starts a key, so "chess" finds "Chess Story" and "story" finds
+    it as well. Each node keeps the best rated stories below it, a lookup walks the
+    prefix and returns that list without visiting the rest of the subtree.
+    """
+
+    def __init__(self, version: int, size: int = MAX_SUGGESTIONS):
+        """
+        :param version: Catalog version the trie reflects.
+        :param size: Number of stories kept in every node.
+        """
+        self.version = version
+        self.size = size
+        self._root = _TrieNode()
+
+    def add(self, story: StoryEntry):
+        rank = _rank(story)
+        words = normalize_text(story.title).split(" ")
+        for start in range(len(words)):
+            node = self._root
+            for char in " ".join(words[start:]):
+                node = node.children.setdefault(char, _TrieNode())
+                self._add_to_top(node, rank, story)
+
+    def _add_to_top(self, node: _TrieNode, rank: Tuple[float, int], story: StoryEntry):
+        if any(entry.id == story.id for _, entry in node.top):
+            return
+        if len(node.top) == self.size and rank >= node.top[-1][0]:
+            return
+        insort(node.top, (rank, story), key=lambda item: item[0])
+        del node.top[self.size :]
+
+    def suggest(self, prefix: str, limit: int = MAX_SUGGESTIONS) -> List[StoryEntry]:
+        """Return at most limit best rated stories with a title word starting with prefix."""
+        prefix = normalize_text(prefix)
+        if not prefix:
+            return []
+        node = self._root
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return []
+        return [story for _, story in node.top[:limit]]
+
+
+def build_title_trie(snapshot: CatalogSnapshot) -> TitleTrie:
+    trie = TitleTrie(snapshot.version)
+    for story in snapshot.stories:
+        trie.add(story)
+    return trie
+
+
+class TitleIndex:
+    """
+    Process-local TitleTrie following the catalog.
+
+    A created story is inserted into the current trie, any other catalog change
+    rebuilds it from the next snapshot.
+    """
+
+    def __init__(self):
+        self._trie: Optional[TitleTrie] = None
+
+    def add(self, story: StoryEntry, version: int):
+        """
+        Insert a created story.
+
+        :param version: Catalog version after the creation, the trie is updated only
+            when it reflects the previous version, otherwise it waits for a rebuild.
+        """
+        trie = self._trie
+        if trie is not None and trie.version == version - 1:
+            trie.add(story)
+            trie.version = version
+
+    async def get_trie(self, db: AsyncSession) -> TitleTrie:
+        trie = self._trie
+        if trie is not None and trie.version == catalog.version:
+            return trie
+        snapshot = await catalog.get_snapshot(db)
+        trie = build_title_trie(snapshot)
+        if self._trie is None or trie.version >= self._trie.version:
+            self._trie = trie
+        return trie
+
+
+title_index = TitleIndex()
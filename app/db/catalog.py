@@ -0,0 +1,299 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+from datetime import datetime
+from types import MappingProxyType
+from typing import Dict, List, Mapping, NamedTuple, Optional, Set, Tuple
+
+from redis.asyncio import Redis
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import Story, Stage, Hint, Tag, StoryTag
+from app.db.matcher import StageMatcher, build_stage_matcher, normalize_text
+from app.db.singleflight import SingleFlight
+from app.db.database import shared_session
+
+logger = logging.getLogger(__name__)
+
+# Maksymalny wiek snapshotu w sekundach, zabezpieczenie na wypadek utraty
+# komunikatu o unieważnieniu z innego workera
+CATALOG_TTL = float(os.getenv("CATALOG_TTL", "300"))
+# Minimalny odstęp między przeładowaniami wymuszonymi brakiem historii lub etapu
+CATALOG_MISS_RELOAD_INTERVAL = float(os.getenv("CATALOG_MISS_RELOAD_INTERVAL", "1"))
+CATALOG_CHANNEL = "catalog:invalidate"
+
+
+class StoryEntry(NamedTuple):
+    id: int
+    title: str
+    description: str
+    type: str
+    difficulty: str
+    rating: Optional[float]
+    cost: int
+    create_date: Optional[datetime]
+
+
+def story_entry(story: Story) -> StoryEntry:
+    return StoryEntry(
+        id=story.id,
+        title=story.title,
+        description=story.description,
+        type=story.type,
+        difficulty=story.difficulty,
+        rating=story.rating,
+        cost=story.cost,
+        create_date=story.create_date,
+    )
+
+
+class StageEntry(NamedTuple):
+    id: int
+    level: int
+    name: str
+    question: str
+    password: str
+    story_id: int
+
+
+class HintEntry(NamedTuple):
+    id: int
+    text: str
+    trigger: str
+    stage_id: int
+
+
+class CatalogSnapshot(NamedTuple):
+    """Immutable copy of stories, their stages ordered by level and hints of every stage."""
+
+    version: int
+    stories: Tuple[StoryEntry, ...]
+    stories_by_id: Mapping[int, StoryEntry]
+    stages_by_story: Mapping[int, Tuple[StageEntry, ...]]
+    stages_by_id: Mapping[int, StageEntry]
+    stages_by_level: Mapping[Tuple[int, int], StageEntry]
+    hints_by_stage: Mapping[int, Tuple[HintEntry, ...]]
+    matchers_by_stage: Mapping[int, StageMatcher]
+    # Indeks odwrócony: tag -> bitmapa id historii, bit n to historia n
+    tag_bitmaps: Mapping[str, int]
+    all_stories_bitmap: int
+
+    def get_story(self, story_id: int) -> Optional[StoryEntry]:
+        return self.stories_by_id.get(story_id)
+
+    def get_stage(self, stage_id: int) -> Optional[StageEntry]:
+        return self.stages_by_id.get(stage_id)
+
+    def get_next_stage(self, stage: StageEntry) -> Optional[StageEntry]:
+        return self.stages_by_level.get((stage.story_id, stage.level + 1))
+
+    def get_hints(self, stage_id: int) -> Tuple[HintEntry, ...]:
+        return self.hints_by_stage.get(stage_id, ())
+
+    def get_matcher(self, stage_id: int) -> StageMatcher:
+        return self.matchers_by_stage[stage_id]
+
+    def get_tag_bitmap(self, tag: str) -> int:
+        return self.tag_bitmaps.get(normalize_text(tag), 0)
+
+    def stories_in_bitmap(self, bitmap: int) -> Tuple[StoryEntry, ...]:
+        return tuple(story for story in self.stories if bitmap >> story.id & 1)
+
+
+async def load_catalog_snapshot(db: AsyncSession, version: int) -> CatalogSnapshot:
+    """Read all stories, stages, hints and tags and build a new snapshot from them."""
+    stories = (await db.execute(select(Story).order_by(Story.id))).scalars().all()
+    stages = (
+        (await db.execute(select(Stage).order_by(Stage.story_id, Stage.level)))
+        .scalars()
+        .all()
+    )
+    hints = (
+        (await db.execute(select(Hint).order_by(Hint.stage_id, Hint.id)))
+        .scalars()
+        .all()
+    )
+
+    story_tags = (await db.execute(select(StoryTag.story_id, Tag.name).join(Tag))).all()
+
+    story_entries = tuple(story_entry(story) for story in stories)
+    stages_by_story: Dict[int, List[StageEntry]] = {}
+    for stage in stages:
+        stages_by_story.setdefault(stage.story_id, []).append(
+            StageEntry(
+                id=stage.id,
+                level=stage.level,
+                name=stage.name,
+                question=stage.question,
+                password=stage.password,
+                story_id=stage.story_id,
+            )
+        )
+    hints_by_stage: Dict[int, List[HintEntry]] = {}
+    for hint in hints:
+        hints_by_stage.setdefault(hint.stage_id, []).append(
+            HintEntry(
+                id=hint.id, text=hint.text, trigger=hint.trigger, stage_id=hint.stage_id
+            )
+        )
+    stage_entries = [entry for entries in stages_by_story.values() for entry in entries]
+
+    # Typ i trudność historii są traktowane jak jej tagi
+    tag_bitmaps: Dict[str, int] = {}
+    all_stories_bitmap = 0
+    for story in story_entries:
+        all_stories_bitmap |= 1 << story.id
+        for tag in (story.type, story.difficulty):
+            tag = normalize_text(tag)
+            tag_bitmaps[tag] = tag_bitmaps.get(tag, 0) | 1 << story.id
+    for story_id, name in story_tags:
+        tag = normalize_text(name)
+        tag_bitmaps[tag] = tag_bitmaps.get(tag, 0) | 1 << story_id
+
+    return CatalogSnapshot(
+        version=version,
+        stories=story_entries,
+        stories_by_id=MappingProxyType({story.id: story for story in story_entries}),
+        stages_by_story=MappingProxyType(
+            {story_id: tuple(entries) for story_id, entries in stages_by_story.items()}
+        ),
+        stages_by_id=MappingProxyType({stage.id: stage for stage in stage_entries}),
+        stages_by_level=MappingProxyType(
+            {(stage.story_id, stage.level): stage for stage in stage_entries}
+        ),
+        hints_by_stage=MappingProxyType(
+            {stage_id: tuple(entries) for stage_id, entries in hints_by_stage.items()}
+        ),
+        matchers_by_stage=MappingProxyType(
+            {
+                stage.id: build_stage_matcher(
+                    [stage.password], hints_by_stage.get(stage.id, ())
+                )
+                for stage in stage_entries
+            }
+        ),
+        tag_bitmaps=MappingProxyType(tag_bitmaps),
+        all_stories_bitmap=all_stories_bitmap,
+    )
+
+
+class Catalog:
+    """
+    Process-local holder of the current CatalogSnapshot.
+
+    Every write to stories, stages or hints has to call invalidate(), which bumps the
+    version. The next reader rebuilds the snapshot and swaps it in as a whole, readers
+    holding the previous snapshot keep a consistent view.
+
+    While listen() runs, invalidations are published on a Redis channel and applied by
+    the other workers. Snapshots older than ttl are rebuilt in case a message was lost.
+    """
+
+    def __init__(
+        self,
+        ttl: float = CATALOG_TTL,
+        miss_reload_interval: float = CATALOG_MISS_RELOAD_INTERVAL,
+        channel: str = CATALOG_CHANNEL,
+    ):
+        """
+        :param ttl: Seconds after which the snapshot is rebuilt.
+        :param miss_reload_interval: Minimum seconds between reloads by reload_on_miss.
+        :param channel: Redis pub/sub channel carrying invalidations between workers.
+        """
+        self.ttl = ttl
+        self.miss_reload_interval = miss_reload_interval
+        self.channel = channel
+        self.version: int = 0
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._loaded_at: float = 0.0
+        self._loads = SingleFlight()
+        self._origin = uuid.uuid4().hex
+        self._redis: Optional[Redis] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._sends: Set[asyncio.Task] = set()
+
+    def invalidate(self):
+        self.version += 1
+        self._publish()
+
+    async def get_snapshot(self, db: AsyncSession) -> CatalogSnapshot:
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.version == self.version:
+            if time.monotonic() - self._loaded_at < self.ttl:
+                return snapshot
+            self.version += 1
+
+        # Wersja jest zapamiętana przed odczytem, zmiana w trakcie budowania
+        # spowoduje ponowne zbudowanie przy następnym odczycie
+        # Równoczesne przebudowy tej samej wersji czekają na jedno wczytanie
+        version = self.version
+
+        async def load() -> CatalogSnapshot:
+            async with shared_session(db) as session:
+                return await load_catalog_snapshot(session, version)
+
+        snapshot = await self._loads.do(version, load)
+        if self._snapshot is None or snapshot.version >= self._snapshot.version:
+            self._snapshot = snapshot
+            self._loaded_at = time.monotonic()
+        return snapshot
+
+    async def reload_on_miss(self, db: AsyncSession) -> CatalogSnapshot:
+        """
+        Rebuild the snapshot after a story or stage wasn't found in it.
+
+        The entry may have been created by another worker whose invalidation didn't
+        arrive yet. Reloads are rate-limited, so requests for ids that don't exist
+        can't rebuild the catalog on every request.
+        """
+        if time.monotonic() - self._loaded_at >= self.miss_reload_interval:
+            self.version += 1
+        return await self.get_snapshot(db)
+
+    async def listen(self, redis_client: Redis):
+        """Publish local invalidations and apply the ones of other workers until cancelled."""
+        self._redis = redis_client
+        self._loop = asyncio.get_running_loop()
+        try:
+            while True:
+                try:
+                    async with redis_client.pubsub() as pubsub:
+                        await pubsub.subscribe(self.channel)
+                        # Zmiany z czasu bez subskrypcji mogły zostać pominięte
+                        self.version += 1
+                        async for message in pubsub.listen():
+                            if (
+                                message["type"] == "message"
+                                and message["data"] != self._origin
+                            ):
+                                self.version += 1
+                except Exception as error:
+                    logger.warning("Catalog invalidation channel failed: %s", error)
+                    await asyncio.sleep(1)
+        finally:
+            self._redis = None
+            self._loop = None
+
+    def _publish(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if self._redis is None or loop is not self._loop:
+            return
+        task = loop.create_task(self._send(self._redis))
+        # Pętla trzyma tylko słabe referencje do zadań
+        self._sends.add(task)
+        task.add_done_callback(self._sends.discard)
+
+    async def _send(self, redis_client: Redis):
+        try:
+            await redis_client.publish(self.channel, self._origin)
+        except Exception as error:
+            logger.warning("Catalog invalidation publish failed: %s", error)
+
+
+catalog = Catalog()
@@ -1,19 +1,165 @@
-from typing import AsyncGenerator
+import logging
+import os
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, AsyncIterator, Dict, Any
 
 from fastapi import Depends
 from app.db.extended_user_database import ExtendedSQLAlchemyUserDatabase
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy import event, func, inspect, select, text
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.ext.asyncio import (
+    create_async_engine,
+    async_sessionmaker,
+    AsyncSession,
+    AsyncEngine,
+)
 from app.db.models import Base, User
+from app.db.writer import WriteExecutor
+from app.db.query_stats import register_query_stats
+from app.db.search import create_story_search
 
+logger = logging.getLogger(__name__)
 
 DATABASE_URL = "sqlite+aiosqlite:///./devdb.db"
+
+# Ustawienia PRAGMA wykonywane przy każdym nowym połączeniu z bazą SQLite.
+# WAL pozwala czytać równolegle z zapisem, busy_timeout zastępuje błędy
+# "database is locked" oczekiwaniem na zwolnienie blokady.
+SQLITE_PROFILES: Dict[str, Dict[str, Any]] = {
+    "development": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -16000,
+        "mmap_size": 0,
+        "temp_store": "MEMORY",
+        "busy_timeout": 5000,
+    },
+    "production": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -64000,
+        "mmap_size": 268435456,
+        "temp_store": "MEMORY",
+        "busy_timeout": 10000,
+    },
+    "durable": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "cache_size": -64000,
+        "mmap_size": 268435456,
+        "temp_store": "MEMORY",
+        "busy_timeout": 10000,
+    },
+}
+DATABASE_PROFILE = os.getenv("DATABASE_PROFILE", "development")
+
+
+def apply_sqlite_profile(dbapi_connection, profile: Dict[str, Any]):
+    cursor = dbapi_connection.cursor()
+    for pragma, value in profile.items():
+        cursor.execute(f"PRAGMA {pragma}={value}")
+    cursor.close()
+
+
+def register_sqlite_profile(
+    async_engine: AsyncEngine, profile_name: str, query_only: bool = False
+):
+    """
+    Apply the PRAGMA profile to every connection opened by the engine.
+
+    With query_only the connections reject every write, it is used by the reader engine.
+    """
+    if profile_name not in SQLITE_PROFILES:
+        raise ValueError(f"Unknown database profile: {profile_name}")
+    profile = dict(SQLITE_PROFILES[profile_name])
+    if query_only:
+        profile["query_only"] = "ON"
+
+    @event.listens_for(async_engine.sync_engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        apply_sqlite_profile(dbapi_connection, profile)
+
+
+async def get_sqlite_profile_status(
+    async_engine: AsyncEngine, profile_name: str = DATABASE_PROFILE
+) -> Dict[str, Any]:
+    """Return the profile name and the PRAGMA values active on a new connection."""
+    pragmas = {}
+    async with async_engine.connect() as conn:
+        for pragma in SQLITE_PROFILES[profile_name]:
+            result = await conn.execute(text(f"PRAGMA {pragma}"))
+            pragmas[pragma] = result.scalar()
+    return {"profile": profile_name, "pragmas": pragmas}
+
+
 engine = create_async_engine(DATABASE_URL)
+register_sqlite_profile(engine, DATABASE_PROFILE)
+register_query_stats(engine)
 async_session_maker = async_sessionmaker(engine, expire_on_commit=False)
 
+# Wszystkie mutacje wykonywane przez StoryManager trafiają do jednego zadania
+# zapisującego, które zapisuje kilka żądań jednym commitem.
+write_executor = WriteExecutor(
+    async_session_maker,
+    max_batch_size=int(os.getenv("DATABASE_WRITE_BATCH_SIZE", "64")),
+)
+
+# Osobna pula połączeń tylko do odczytu. W trybie WAL czytelnicy nie czekają
+# na zapisy wykonywane przez silnik zapisujący.
+READ_POOL_SIZE = int(os.getenv("DATABASE_READ_POOL_SIZE", "10"))
+read_engine = create_async_engine(
+    DATABASE_URL, poolclass=AsyncAdaptedQueuePool, pool_size=READ_POOL_SIZE
+)
+register_sqlite_profile(read_engine, DATABASE_PROFILE, query_only=True)
+register_query_stats(read_engine)
+async_read_session_maker = async_sessionmaker(read_engine, expire_on_commit=False)
+
+
+def create_missing_indexes(connection):
+    """
+    Create indexes declared on the models which are missing in an existing database.
+
+    create_all only creates indexes together with new tables. A unique index is skipped
+    when the table already holds duplicate rows, the duplicates are logged so they can
+    be cleaned up, and the index is created on the next start.
+    """
+    for table in Base.metadata.sorted_tables:
+        existing = {
+            index["name"] for index in inspect(connection).get_indexes(table.name)
+        }
+        for index in table.indexes:
+            if index.name in existing:
+                continue
+            if index.unique:
+                duplicates = find_duplicates(connection, index)
+                if duplicates:
+                    logger.error(
+                        "Unique index %s not created, duplicate %s values: %s",
+                        index.name,
+                        [column.name for column in index.columns],
+                        duplicates,
+                    )
+                    continue
+            index.create(connection)
+
+
+def find_duplicates(connection, index, limit: int = 20) -> list:
+    """Return up to limit value combinations occurring more than once in the index columns."""
+    columns = list(index.columns)
+    stmt = (
+        select(*columns, func.count().label("count"))
+        .group_by(*columns)
+        .having(func.count() > 1)
+        .limit(limit)
+    )
+    return [tuple(row) for row in connection.execute(stmt)]
+
 
 async def create_db_and_tables():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(create_missing_indexes)
+        await conn.run_sync(create_story_search)
 
 
 async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
@@ -21,5 +167,27 @@ async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
         yield session
 
 
+async def get_async_read_session() -> AsyncGenerator[AsyncSession, None]:
+    async with async_read_session_maker() as session:
+        yield session
+
+
+@asynccontextmanager
+async def shared_session(db: AsyncSession) -> AsyncIterator[AsyncSession]:
+    """
+    Open a new session on the engine of db.
+
+    Used by work shared between requests, e.g. coalesced loads, which mustn't depend on
+    the session of the request that started it, as that request may be cancelled and
+    close its session in the meantime.
+    """
+    async with AsyncSession(db.bind, expire_on_commit=False) as session:
+        yield session
+
+
+def get_write_executor() -> WriteExecutor:
+    return write_executor
+
+
 async def get_user_db(session: AsyncSession = Depends(get_async_session)):
     yield ExtendedSQLAlchemyUserDatabase(session, User)
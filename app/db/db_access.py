@@ -1,8 +1,11 @@
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
 from app.db.models import StoryAccess, Attempt
-from typing import Optional
+from typing import Dict, Iterable, List, Optional, Tuple
 
 from app.db.db_queries import get_instance
+from app.db.db_attempt import latest_attempt_id
 from app.db.models import User
 from app.exceptions.exceptions import EntityDoesNotExistError, UnAuthenticatedUserError
 
@@ -12,21 +15,74 @@ async def get_story_access(db: AsyncSession, user: User, story_id: int) -> Story
     return await get_instance(db, StoryAccess, user_id=user.id, story_id=story_id)
 
 
-async def get_story_access_by_attempt(
+async def get_access_progress(
+    db: AsyncSession, user: User, story_id: int
+) -> Tuple[Optional[StoryAccess], Optional[Attempt]]:
+    """Fetch the user's StoryAccess to the story together with its latest Attempt."""
+    stmt = (
+        select(StoryAccess, Attempt)
+        .outerjoin(Attempt, Attempt.id == latest_attempt_id())
+        .where(StoryAccess.user_id == user.id, StoryAccess.story_id == story_id)
+        .limit(1)
+    )
+    result = await db.execute(stmt)
+    row = result.first()
+    if row is None:
+        return None, None
+    return row.StoryAccess, row.Attempt
+
+
+async def get_access_progress_many(
+    db: AsyncSession, user: User, story_ids: Iterable[int]
+) -> Dict[int, Tuple[StoryAccess, Optional[Attempt]]]:
+    """
+    Fetch the user's StoryAccess with its latest Attempt for many stories at once.
+
+    Stories the user has no access to are missing from the result.
+    """
+    stmt = (
+        select(StoryAccess, Attempt)
+        .outerjoin(Attempt, Attempt.id == latest_attempt_id())
+        .where(StoryAccess.user_id == user.id, StoryAccess.story_id.in_(story_ids))
+    )
+    result = await db.execute(stmt)
+    return {row.StoryAccess.story_id: (row.StoryAccess, row.Attempt) for row in result}
+
+
+async def get_attempt_progress(
     db: AsyncSession, attempt_id: int, user: User
-) -> Optional[StoryAccess]:
-    """Fetch a specific StoryAccess instance by attempt."""
-    attempt = await get_instance(db, Attempt, id=attempt_id)
-    if not attempt:
+) -> Tuple[StoryAccess, Attempt]:
+    """
+    Fetch the StoryAccess and its latest Attempt by any attempt of the access.
+
+    Both, including the ownership check, are resolved with one statement.
+    """
+    latest_attempt = aliased(Attempt)
+    stmt = (
+        select(
+            StoryAccess,
+            latest_attempt,
+            (StoryAccess.user_id == user.id).label("is_owner"),
+        )
+        .select_from(Attempt)
+        .join(StoryAccess, StoryAccess.id == Attempt.story_access_id)
+        .join(latest_attempt, latest_attempt.id == latest_attempt_id())
+        .where(Attempt.id == attempt_id)
+    )
+    result = await db.execute(stmt)
+    row = result.first()
+    if row is None:
         raise EntityDoesNotExistError(
             message=f"Attempt with {attempt_id} id does not exist"
         )
-    await db.refresh(attempt, ["access"])
-    story_access = attempt.access
-    if story_access.user_id == user.id:
-        await db.refresh(story_access, ["story"])
-        return story_access
-    else:
+    if not row.is_owner:
         raise UnAuthenticatedUserError(
             message="User doesn't have access to this attempt"
         )
+    return row.StoryAccess, row[1]
+
+
+async def get_owned_story_ids(db: AsyncSession, user: User) -> List[int]:
+    """Ids of all stories the user has access to."""
+    stmt = select(StoryAccess.story_id).where(StoryAccess.user_id == user.id)
+    return list((await db.execute(stmt)).scalars().all())
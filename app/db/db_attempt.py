@@ -1,4 +1,8 @@
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, update
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm.attributes import set_committed_value
+from typing import Optional, Tuple
 
 from app.db.models import (
     Attempt,
@@ -12,34 +16,39 @@ from app.db.models import (
 from app.db.db_queries import (
     get_instance,
     get_instances,
-    get_last_instance,
     get_first_instance,
     create_instance,
+    add_instance,
 )
 from datetime import datetime
 
 
-async def get_active_attempt(db: AsyncSession, story_access_id: int):
-    attempt = await get_last_instance(
-        db, Attempt, order_by="id", story_access_id=story_access_id
+def latest_attempt_id():
+    """Correlated subquery selecting the id of the latest attempt of the StoryAccess row."""
+    return (
+        select(func.max(Attempt.id))
+        .where(Attempt.story_access_id == StoryAccess.id)
+        .correlate(StoryAccess)
+        .scalar_subquery()
     )
-    if attempt:
-        return attempt
-    return None
 
 
 async def get_hints(db: AsyncSession, attempt_id: int):
     hints_attempts = await get_instances(db, HintsAttempt, attempt_id=attempt_id)
     hints_id = [hints_attempt.hint_id for hints_attempt in hints_attempts]
-    return await get_instances(db, Hint, id=hints_id)
+    # Wskazówki zmieniają się rzadko, ich wyniki są brane z cache zapytań
+    return await get_instances(db, Hint, cached=True, id=hints_id)
 
 
-async def create_first_attempt(db: AsyncSession, story_access: StoryAccess) -> Attempt:
+async def create_first_attempt(
+    db: AsyncSession, story_access: StoryAccess, commit: bool = True
+) -> Attempt:
     """
     Creates the first attempt for a story.
 
     :param db: Database session.
     :param story_access: story_access object
+    :param commit: Commit the new attempt, otherwise it is only added to the session.
     :return: The newly created Attempt.
     :raises Exception: If the attempt creation fails.
     """
@@ -55,53 +64,90 @@ async def create_first_attempt(db: AsyncSession, story_access: StoryAccess) -> A
             stage_id=first_stage.id,
         )
         db.add(new_attempt)
-        await db.commit()
-        await db.refresh(new_attempt)
+        if commit:
+            await db.commit()
+            await db.refresh(new_attempt)
         return new_attempt
     except Exception as e:
-        await db.rollback()
+        if commit:
+            await db.rollback()
         raise Exception(f"Failed to create the first attempt: {str(e)}")
 
 
-async def add_password_attempt(session: AsyncSession, attempt: Attempt, password: str):
-    return await create_instance(
+async def add_password_attempt(
+    session: AsyncSession, attempt: Attempt, password: str, commit: bool = True
+):
+    save_instance = create_instance if commit else add_instance
+    return await save_instance(
         session, PasswordAttempt, attempt_id=attempt.id, password=password
     )
 
 
-async def check_new_hint(session: AsyncSession, attempt: Attempt, password: str):
-    hint = await get_instance(
-        session, Hint, stage_id=attempt.stage_id, trigger=password
+async def is_hint_discovered(session: AsyncSession, attempt: Attempt, hint) -> bool:
+    hints_attempt = await get_instance(
+        session, HintsAttempt, attempt_id=attempt.id, hint_id=hint.id
+    )
+    return hints_attempt is not None
+
+
+async def add_hints_attempt(
+    session: AsyncSession, attempt: Attempt, hint: Hint, commit: bool = True
+) -> bool:
+    """
+    Record the hint as discovered in the attempt.
+
+    A hint already recorded by a concurrent request is skipped instead of failing on
+    the unique index.
+
+    :return: True when the hint was recorded by this call.
+    """
+    stmt = (
+        insert(HintsAttempt)
+        .values(attempt_id=attempt.id, hint_id=hint.id, enter_date=datetime.now())
+        .on_conflict_do_nothing(index_elements=["attempt_id", "hint_id"])
+    )
+    result = await session.execute(stmt)
+    if commit:
+        await session.commit()
+    return result.rowcount > 0
+
+
+async def finish_attempt(session: AsyncSession, attempt: Attempt, commit: bool = True):
+    # Attempt może pochodzić z innej sesji (np. sesji odczytu), dlatego zapis
+    # jest wykonywany przez UPDATE, a obiekt jest tylko aktualizowany w pamięci
+    finish_date = datetime.now()
+    await session.execute(
+        update(Attempt)
+        .where(Attempt.id == attempt.id)
+        .values(finish_date=finish_date)
+        .execution_options(synchronize_session=False)
     )
-    if hint:
-        if not await get_instance(
-            session, HintsAttempt, attempt_id=attempt.id, hint_id=hint.id
-        ):
-            await create_instance(
-                session,
-                HintsAttempt,
-                attempt_id=attempt.id,
-                hint_id=hint.id,
-                enter_date=datetime.now(),
-            )
-            return True
-
-    return False
-
-
-async def finish_attempt(session: AsyncSession, attempt: Attempt):
-    attempt.finish_date = datetime.now()
-    await session.commit()
+    set_committed_value(attempt, "finish_date", finish_date)
+    if commit:
+        await session.commit()
     return attempt
 
 
 async def create_next_attempt(
-    session: AsyncSession, attempt: Attempt, next_stage: Stage
+    session: AsyncSession, attempt: Attempt, next_stage: Stage, commit: bool = True
 ):
-    return await create_instance(
+    save_instance = create_instance if commit else add_instance
+    return await save_instance(
         session,
         Attempt,
         story_access_id=attempt.story_access_id,
         stage_id=next_stage.id,
         start_date=attempt.finish_date,
     )
+
+
+async def get_hints_summary(
+    session: AsyncSession, attempt_id: int
+) -> Tuple[int, Optional[datetime]]:
+    """Return the number of hints discovered in the attempt and the last discovery date."""
+    stmt = select(func.count(HintsAttempt.id), func.max(HintsAttempt.enter_date)).where(
+        HintsAttempt.attempt_id == attempt_id
+    )
+    result = await session.execute(stmt)
+    count, last_enter_date = result.one()
+    return count, last_enter_date
@@ -1,9 +1,14 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, desc
+from sqlalchemy import select, desc, bindparam, insert, inspect
 from sqlalchemy import and_
-from typing import Type, List, Any, Optional
+from sqlalchemy.sql import Select
+from typing import Type, List, Any, Optional, Tuple, Dict
+from functools import lru_cache
 from pydantic import BaseModel
 from sqlalchemy import true
+from sqlalchemy.orm import make_transient_to_detached
+
+from app.db.query_cache import query_cache, statement_tables, has_pending_writes
 
 
 class MultipleResultsException(Exception):
@@ -18,12 +23,161 @@ def convert_to_pydantic(
     return [pydantic_model.model_validate(model) for model in models]
 
 
+def _filter_signature(filters: Dict[str, Any]) -> Tuple[Tuple[str, str], ...]:
+    """
+    Describe the shape of the filters without their values.
+
+    Lists become ``IN`` clauses, ``None`` becomes ``IS NULL`` and everything else
+    is compared with ``=``, so two calls with the same signature can share a statement.
+    """
+    signature = []
+    for attr, value in filters.items():
+        if isinstance(value, list):
+            signature.append((attr, "in"))
+        elif value is None:
+            signature.append((attr, "null"))
+        else:
+            signature.append((attr, "eq"))
+    return tuple(signature)
+
+
+def _order_by_key(order_by: Any) -> Optional[str]:
+    if order_by is None or isinstance(order_by, str):
+        return order_by
+    return order_by.key
+
+
+@lru_cache(maxsize=512)
+def _cached_select(
+    model: Type[Any],
+    signature: Tuple[Tuple[str, str], ...],
+    order_by: Optional[str] = None,
+    descending: bool = False,
+    limit: Optional[int] = None,
+) -> Select:
+    """
+    Build (once) a parametrized SELECT for the model and filter signature.
+
+    Values are supplied as bound parameters at execution time, so the statement
+    and its compiled SQL are reused by every call with the same signature.
+    """
+    filters = []
+    for attr, operator in signature:
+        column = getattr(model, attr)
+        if operator == "in":
+            filters.append(column.in_(bindparam(attr, expanding=True)))
+        elif operator == "null":
+            filters.append(column.is_(None))
+        else:
+            filters.append(column == bindparam(attr))
+
+    stmt = select(model).where(and_(true(), *filters))
+    if order_by is not None:
+        column = getattr(model, order_by)
+        stmt = stmt.order_by(desc(column) if descending else column)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return stmt
+
+
+def _statement_params(filters: Dict[str, Any]) -> Dict[str, Any]:
+    return {attr: value for attr, value in filters.items() if value is not None}
+
+
+async def _execute_cached(
+    session: AsyncSession,
+    model: Type[Any],
+    filters: Dict[str, Any],
+    order_by: Any = None,
+    descending: bool = False,
+    limit: Optional[int] = None,
+):
+    stmt = _cached_select(
+        model, _filter_signature(filters), _order_by_key(order_by), descending, limit
+    )
+    return await session.execute(stmt, _statement_params(filters))
+
+
+@lru_cache(maxsize=512)
+def _compiled_sql(stmt: Select) -> str:
+    return str(stmt)
+
+
+def _params_key(params: Dict[str, Any]) -> Tuple[Tuple[str, Any], ...]:
+    return tuple(
+        (attr, tuple(value) if isinstance(value, list) else value)
+        for attr, value in sorted(params.items())
+    )
+
+
+def _column_values(instance: Any) -> Dict[str, Any]:
+    mapper = inspect(instance).mapper
+    return {attr.key: getattr(instance, attr.key) for attr in mapper.column_attrs}
+
+
+def _attach(session: AsyncSession, model: Type[Any], values: Dict[str, Any]) -> Any:
+    """Return the instance of the cached row, loaded objects of the session win."""
+    mapper = inspect(model)
+    identity_key = mapper.identity_key_from_primary_key(
+        [values[column.key] for column in mapper.primary_key]
+    )
+    instance = session.identity_map.get(identity_key)
+    if instance is None:
+        instance = model(**values)
+        make_transient_to_detached(instance)
+        session.add(instance)
+    return instance
+
+
+async def _fetch_instances(
+    session: AsyncSession,
+    model: Type[Any],
+    filters: Dict[str, Any],
+    order_by: Any = None,
+    descending: bool = False,
+    limit: Optional[int] = None,
+    cached: bool = False,
+) -> List[Any]:
+    """
+    Execute the cached statement and return the loaded instances.
+
+    With cached=True the rows are served from the query result cache, keyed on the
+    compiled SQL and the parameters.
+    """
+    if not cached:
+        result = await _execute_cached(
+            session, model, filters, order_by, descending, limit
+        )
+        return result.scalars().all()
+
+    stmt = _cached_select(
+        model, _filter_signature(filters), _order_by_key(order_by), descending, limit
+    )
+    params = _statement_params(filters)
+    key = (_compiled_sql(stmt), _params_key(params))
+    rows = query_cache.get(key)
+    if rows is not None:
+        return [_attach(session, model, values) for values in rows]
+
+    tables = statement_tables(stmt)
+    generation = query_cache.generation
+    result = await session.execute(stmt, params)
+    instances = result.scalars().all()
+    if not has_pending_writes(session.sync_session, tables):
+        query_cache.set(
+            key,
+            [_column_values(instance) for instance in instances],
+            tables,
+            generation,
+        )
+    return instances
+
+
 async def get_instance(
-    session: AsyncSession, model: Type[Any], **kwargs
+    session: AsyncSession, model: Type[Any], cached: bool = False, **kwargs
 ) -> Optional[Any]:
-    stmt = select(model).filter_by(**kwargs)
-    result = await session.execute(stmt)
-    instances = result.scalars().all()
+    # Two rows are enough to detect a duplicate, there is no need to load all of them
+    instances = await _fetch_instances(session, model, kwargs, limit=2, cached=cached)
 
     if len(instances) > 1:
         raise MultipleResultsException(
@@ -34,30 +188,84 @@ async def get_instance(
     return None
 
 
-async def get_last_instance(session: AsyncSession, model, order_by, **kwargs):
-    stmt = select(model).filter_by(**kwargs).order_by(desc(order_by))
-    result = await session.execute(stmt)
-    instance = result.scalars().first()
-    if instance:
-        return instance
+async def get_last_instance(
+    session: AsyncSession, model, order_by, cached: bool = False, **kwargs
+):
+    instances = await _fetch_instances(
+        session,
+        model,
+        kwargs,
+        order_by=order_by,
+        descending=True,
+        limit=1,
+        cached=cached,
+    )
+    if instances:
+        return instances[0]
 
 
-async def get_first_instance(session: AsyncSession, model, order_by, **kwargs):
-    stmt = select(model).filter_by(**kwargs).order_by(order_by)
-    result = await session.execute(stmt)
-    instance = result.scalars().first()
-    if instance:
-        return instance
+async def get_first_instance(
+    session: AsyncSession, model, order_by, cached: bool = False, **kwargs
+):
+    instances = await _fetch_instances(
+        session, model, kwargs, order_by=order_by, limit=1, cached=cached
+    )
+    if instances:
+        return instances[0]
 
 
-async def create_instance(session: AsyncSession, model, **kwargs):
+async def add_instance(session: AsyncSession, model, **kwargs):
+    """Add a new instance to the session, it is written with the next flush or commit."""
     instance = model(**kwargs)
     session.add(instance)
+    return instance
+
+
+async def create_instance(session: AsyncSession, model, **kwargs):
+    instance = await add_instance(session, model, **kwargs)
     await session.commit()
     await session.refresh(instance)
     return instance
 
 
+async def create_instances(
+    session: AsyncSession,
+    model,
+    rows: List[Dict[str, Any]],
+    commit: bool = True,
+    primary_keys_only: bool = False,
+) -> List[Any]:
+    """
+    Insert many rows with multi-row INSERT ... RETURNING statements.
+
+    Rows are inserted as a bulk operation, so ORM validators (@validates) are not run.
+
+    :param session: Database session.
+    :param model: Model class of the inserted rows.
+    :param rows: List of dictionaries with column values, one per row.
+    :param commit: Commit after the insert, otherwise the rows stay in the open transaction.
+    :param primary_keys_only: Return only primary keys instead of model instances.
+    :return: Created instances or their primary keys, in the order of rows.
+    """
+    if not rows:
+        return []
+    if primary_keys_only:
+        primary_key = inspect(model).primary_key
+        stmt = insert(model).returning(*primary_key, sort_by_parameter_order=True)
+        result = await session.execute(stmt, rows)
+        if len(primary_key) == 1:
+            instances = result.scalars().all()
+        else:
+            instances = [tuple(row) for row in result.all()]
+    else:
+        stmt = insert(model).returning(model, sort_by_parameter_order=True)
+        result = await session.execute(stmt, rows)
+        instances = result.scalars().all()
+    if commit:
+        await session.commit()
+    return instances
+
+
 async def get_or_create(session: AsyncSession, model, **kwargs):
     instance = await get_instance(session, model, **kwargs)
     if not instance:
@@ -65,14 +273,12 @@ async def get_or_create(session: AsyncSession, model, **kwargs):
     return instance
 
 
-async def get_instances(session: AsyncSession, model, **kwargs):
-    filters = []
-    for attr, value in kwargs.items():
-        if isinstance(value, list):
-            filters.append(getattr(model, attr).in_(value))
-        else:
-            filters.append(getattr(model, attr) == value)
-    stmt = select(model).where(and_(true(), *filters))
-    result = await session.execute(stmt)
-    instances = result.scalars().all()
+async def get_instances(session: AsyncSession, model, cached: bool = False, **kwargs):
+    """
+    Return instances matching the filters.
+
+    :param cached: Serve the result from the query result cache, for rarely
+        changing tables.
+    """
+    instances = await _fetch_instances(session, model, kwargs, cached=cached)
     return instances
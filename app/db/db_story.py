@@ -1,8 +1,17 @@
+import base64
+import json
+from datetime import datetime
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from app.db.models import Story
-from app.schemas.story import StoryDisplay
-from app.db.db_queries import create_instance, get_instances
+from sqlalchemy import select, func, and_, true, tuple_
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional, Tuple
+from app.db.models import Story, Tag, StoryTag
+from app.schemas.story import StoryDisplay, StorySortEnum
+from app.exceptions.exceptions import InvalidCursorError, UnAuthenticatedUserError
+from app.db.matcher import normalize_text
+from app.db.tag_query import tokenize_tag_query, query_terms, evaluate_tag_query
+from app.db.db_queries import create_instance, get_instances, get_or_create
+from app.db.catalog import catalog, StoryEntry, story_entry
+from app.db.autocomplete import title_index
 
 
 async def get_all_stories(db: AsyncSession):
@@ -17,6 +26,12 @@ async def get_story_by_id(db: AsyncSession, story_id: int):
     return await db.scalar(stmt)
 
 
+async def get_catalog_stories(db: AsyncSession) -> Tuple[StoryEntry, ...]:
+    """Return all stories from the catalog snapshot, SQL is executed only on rebuild."""
+    snapshot = await catalog.get_snapshot(db)
+    return snapshot.stories
+
+
 async def create_story(db: AsyncSession, request: StoryDisplay):
     story = await create_instance(
         db,
@@ -28,5 +43,189 @@ async def create_story(db: AsyncSession, request: StoryDisplay):
         rating=request.rating,
         cost=request.cost,
     )
+    catalog.invalidate()
+    # Nowy tytuł trafia do drzewa podpowiedzi bez jego przebudowy
+    title_index.add(story_entry(story), catalog.version)
 
     return story
+
+
+class StoryFilters(NamedTuple):
+    type: Optional[str] = None
+    difficulty: Optional[str] = None
+    min_cost: Optional[int] = None
+    max_cost: Optional[int] = None
+
+
+def _story_conditions(filters: StoryFilters, skip_facet: Optional[str] = None) -> list:
+    conditions = []
+    if filters.type is not None and skip_facet != "type":
+        conditions.append(Story.type == filters.type)
+    if filters.difficulty is not None and skip_facet != "difficulty":
+        conditions.append(Story.difficulty == filters.difficulty)
+    if filters.min_cost is not None:
+        conditions.append(Story.cost >= filters.min_cost)
+    if filters.max_cost is not None:
+        conditions.append(Story.cost <= filters.max_cost)
+    return conditions
+
+
+def encode_cursor(story: Story, sort: StorySortEnum) -> str:
+    value = getattr(story, sort.value)
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([value, story.id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def decode_cursor(cursor: str, sort: StorySortEnum) -> Tuple[Any, int]:
+    try:
+        value, story_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        # Kursor pochodzi od klienta, wartość musi mieć typ kolumny sortowania
+        if not isinstance(story_id, int) or isinstance(story_id, bool):
+            raise TypeError("cursor id")
+        if sort == StorySortEnum.create_date:
+            if not isinstance(value, str):
+                raise TypeError("cursor create_date")
+            value = datetime.fromisoformat(value)
+        elif not _is_number(value) and not (
+            value is None and sort == StorySortEnum.rating
+        ):
+            raise TypeError(f"cursor {sort.value}")
+        return value, story_id
+    except (ValueError, TypeError):
+        raise InvalidCursorError(message="Invalid pagination cursor")
+
+
+def _after_cursor(column, value: Any, story_id: int, descending: bool) -> list:
+    """
+    Keyset conditions selecting rows after (value, story_id), in the page order.
+
+    Every condition is one range of the (column, id) index, SQLite resolves the
+    row-value comparison as such a range. SQLite puts NULLs first in ascending and last
+    in descending order, so for a nullable column the NULL rows are a separate range
+    read before or after the others.
+    """
+    if value is None:
+        if descending:
+            return [and_(column.is_(None), Story.id < story_id)]
+        return [and_(column.is_(None), Story.id > story_id), column.is_not(None)]
+    if descending:
+        conditions = [tuple_(column, Story.id) < tuple_(value, story_id)]
+        if column.nullable:
+            conditions.append(column.is_(None))
+        return conditions
+    return [tuple_(column, Story.id) > tuple_(value, story_id)]
+
+
+async def get_story_page(
+    db: AsyncSession,
+    filters: StoryFilters,
+    sort: StorySortEnum = StorySortEnum.create_date,
+    descending: bool = False,
+    cursor: Optional[str] = None,
+    limit: int = 20,
+) -> Tuple[List[Story], Optional[str]]:
+    """
+    Return one page of stories ordered by the sort column and id, and the next cursor.
+
+    Pages are read with keyset conditions from the (column, id) index, or from
+    the (type or difficulty, column, id) index when filtered, so a page costs the same
+    regardless of its position. Cost limits are checked on the scanned rows.
+    """
+    column = getattr(Story, sort.value)
+    stmt = select(Story).where(*_story_conditions(filters))
+    if descending:
+        stmt = stmt.order_by(column.desc(), Story.id.desc())
+    else:
+        stmt = stmt.order_by(column, Story.id)
+    conditions = [true()]
+    if cursor:
+        value, story_id = decode_cursor(cursor, sort)
+        conditions = _after_cursor(column, value, story_id, descending)
+
+    # Jeden dodatkowy wiersz mówi, czy istnieje następna strona
+    stories = []
+    for condition in conditions:
+        missing = limit + 1 - len(stories)
+        result = await db.execute(stmt.where(condition).limit(missing))
+        stories.extend(result.scalars().all())
+        if len(stories) > limit:
+            break
+
+    next_cursor = None
+    if len(stories) > limit:
+        stories = stories[:limit]
+        next_cursor = encode_cursor(stories[-1], sort)
+    return stories, next_cursor
+
+
+async def get_story_facets(
+    db: AsyncSession, filters: StoryFilters
+) -> Dict[str, Dict[str, int]]:
+    """
+    Count stories per type and per difficulty.
+
+    Each facet is counted with the other filters applied, but not its own, so the
+    counts show what selecting another value would return.
+    """
+    facets = {}
+    for facet in ("type", "difficulty"):
+        column = getattr(Story, facet)
+        stmt = (
+            select(column, func.count(Story.id))
+            .where(*_story_conditions(filters, skip_facet=facet))
+            .group_by(column)
+        )
+        facets[facet] = {value: count for value, count in await db.execute(stmt)}
+    return facets
+
+
+# Zarezerwowany tag oznaczający historie posiadane przez użytkownika
+OWNED_TAG = "owned"
+
+
+async def add_story_tags(db: AsyncSession, story_id: int, names: List[str]):
+    """Tag the story, missing tags are created."""
+    for name in names:
+        tag = await get_or_create(db, Tag, name=normalize_text(name))
+        if not await db.get(StoryTag, (story_id, tag.id)):
+            db.add(StoryTag(story_id=story_id, tag_id=tag.id))
+    await db.commit()
+    catalog.invalidate()
+
+
+async def get_stories_by_tags(
+    db: AsyncSession,
+    query: str,
+    load_owned: Optional[Callable[[], Awaitable[int]]] = None,
+) -> Tuple[StoryEntry, ...]:
+    """
+    Return stories matching a tag query like "horror AND easy AND NOT owned".
+
+    The query is evaluated on the tag bitmaps of the catalog snapshot, without SQL.
+
+    :param load_owned: Returns the bitset of stories owned by the user, needed only
+        by queries using the owned tag.
+    """
+    tokens = tokenize_tag_query(query)
+    snapshot = await catalog.get_snapshot(db)
+    owned = 0
+    if OWNED_TAG in {normalize_text(term) for term in query_terms(tokens)}:
+        if load_owned is None:
+            raise UnAuthenticatedUserError(
+                message="User has to be logged in to query owned stories"
+            )
+        owned = await load_owned()
+
+    def resolve(term: str) -> int:
+        if normalize_text(term) == OWNED_TAG:
+            return owned & snapshot.all_stories_bitmap
+        return snapshot.get_tag_bitmap(term)
+
+    bitmap = evaluate_tag_query(tokens, resolve, snapshot.all_stories_bitmap)
+    return snapshot.stories_in_bitmap(bitmap)
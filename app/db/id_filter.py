@@ -0,0 +1,104 @@
+import os
+import time
+from typing import Optional
+
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.db.models import Attempt
+from app.db.singleflight import SingleFlight
+from app.db.database import shared_session
+
+# Minimalny odstęp w sekundach między wczytaniami wywołanymi przez id daleko powyżej
+# znanego zakresu, w tym czasie takie id są odrzucane bez zapytania
+ID_FILTER_RELOAD_INTERVAL = float(os.getenv("ID_FILTER_RELOAD_INTERVAL", "1"))
+# Id do tylu powyżej znanego zakresu mogły zostać nadane przez inne procesy,
+# zawsze wczytują nowe id, wartość musi przekraczać liczbę wstawień w odstępie wczytań
+ID_FILTER_NEAR_WINDOW = int(os.getenv("ID_FILTER_NEAR_WINDOW", "10000"))
+
+
+class IdFilter:
+    """
+    Bitmap of existing ids of an autoincrement table with rate-limited reloads.
+
+    Ids up to the loaded bound are answered from the bitmap alone. New rows always get
+    ids above every existing one, so an id just above the bound loads the ids inserted
+    since the last load, such ids may have been given out by other processes. Ids far
+    above the bound can't exist yet, they load new ids at most once per reload_interval
+    and are rejected in between. Ids flushed by this process are added right away. The
+    filter only rejects, a positive answer still has to be confirmed by the query
+    loading the row.
+    """
+
+    def __init__(
+        self,
+        model,
+        reload_interval: float = ID_FILTER_RELOAD_INTERVAL,
+        near_window: int = ID_FILTER_NEAR_WINDOW,
+    ):
+        """
+        :param model: Model with an autoincrement integer id.
+        :param reload_interval: Minimum seconds between loads caused by ids far above the
+            bound.
+        :param near_window: How far above the bound ids always load new ids, it has to
+            exceed the number of rows inserted by all processes per reload_interval.
+        """
+        self.model = model
+        self.reload_interval = reload_interval
+        self.near_window = near_window
+        self._loads = SingleFlight()
+        self.reset()
+
+    def reset(self):
+        self._bitmap = bytearray()
+        self._bound: Optional[int] = None
+        self._loaded_at: float = 0.0
+
+    def add(self, id_: int):
+        index, bit = divmod(id_, 8)
+        if index >= len(self._bitmap):
+            self._bitmap.extend(bytes(index - len(self._bitmap) + 1))
+        self._bitmap[index] |= 1 << bit
+
+    def _has(self, id_: int) -> bool:
+        index, bit = divmod(id_, 8)
+        return index < len(self._bitmap) and bool(self._bitmap[index] & (1 << bit))
+
+    async def might_exist(self, db: AsyncSession, id_: int) -> bool:
+        if id_ <= 0:
+            return False
+        if self._has(id_):
+            return True
+        if self._bound is not None:
+            if id_ <= self._bound:
+                return False
+            if (
+                id_ > self._bound + self.near_window
+                and time.monotonic() - self._loaded_at < self.reload_interval
+            ):
+                return False
+
+        await self._loads.do(self._bound, lambda: self._load(db))
+        return self._has(id_)
+
+    async def _load(self, db: AsyncSession):
+        bound = self._bound or 0
+        stmt = select(self.model.id).where(self.model.id > bound)
+        # Wczytanie jest wspólne dla kilku żądań, nie może używać sesji jednego z nich
+        async with shared_session(db) as session:
+            ids = (await session.execute(stmt)).scalars().all()
+        for id_ in ids:
+            self.add(id_)
+        self._bound = max(ids, default=bound)
+        self._loaded_at = time.monotonic()
+
+
+attempt_ids = IdFilter(Attempt)
+
+
+@event.listens_for(Session, "after_flush")
+def add_flushed_attempt_ids(session: Session, flush_context):
+    for instance in session.new:
+        if isinstance(instance, Attempt):
+            attempt_ids.add(instance.id)
@@ -0,0 +1,46 @@
+import unicodedata
+from types import MappingProxyType
+from typing import Any, Iterable, Mapping, NamedTuple, Optional, FrozenSet
+
+# Litery bez rozkładu w NFKD, pozostałe polskie znaki tracą ogonki przy usuwaniu
+# znaków łączących
+_FOLDED_LETTERS = str.maketrans({"ł": "l", "Ł": "L"})
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize user input for comparisons.
+
+    Folds case and Polish diacritics (ą -> a, ł -> l, ...) and collapses whitespace.
+    """
+    decomposed = unicodedata.normalize("NFKD", text.translate(_FOLDED_LETTERS))
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(stripped.casefold().split())
+
+
+class StageMatcher(NamedTuple):
+    """Precompiled answers and hint triggers of one stage."""
+
+    answers: FrozenSet[str]
+    triggers: Mapping[str, Any]
+
+    def is_answer(self, password: str) -> bool:
+        return normalize_text(password) in self.answers
+
+    def get_hint(self, password: str) -> Optional[Any]:
+        return self.triggers.get(normalize_text(password))
+
+
+def build_stage_matcher(answers: Iterable[str], hints: Iterable) -> StageMatcher:
+    """
+    Compile a matcher from the stage answers and its hints.
+
+    When two hints share the same normalized trigger the first one wins.
+    """
+    triggers = {}
+    for hint in hints:
+        triggers.setdefault(normalize_text(hint.trigger), hint)
+    return StageMatcher(
+        answers=frozenset(normalize_text(answer) for answer in answers),
+        triggers=MappingProxyType(triggers),
+    )
@@ -22,6 +22,7 @@ from sqlalchemy import (
     Float,
     SmallInteger,
     ForeignKey,
+    Index,
 )
 from datetime import datetime
 
@@ -46,6 +47,19 @@ class User(SQLAlchemyBaseUserTableUUID, Base):
 
 class Story(Base):
     __tablename__ = "story"
+    # Indeksy stronicowania katalogu, id rozstrzyga remisy w kolejności, warianty
+    # z typem i trudnością obsługują strony filtrowane bez sortowania
+    __table_args__ = (
+        Index("ix_story_rating_id", "rating", "id"),
+        Index("ix_story_cost_id", "cost", "id"),
+        Index("ix_story_create_date_id", "create_date", "id"),
+        Index("ix_story_type_difficulty", "type", "difficulty"),
+        *(
+            Index(f"ix_story_{facet}_{column}_id", facet, column, "id")
+            for facet in ("type", "difficulty")
+            for column in ("rating", "cost", "create_date")
+        ),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     title: Mapped[str]
@@ -58,10 +72,35 @@ class Story(Base):
 
     stages: Mapped[List["Stage"]] = relationship(back_populates="story")
     story_access: Mapped[List["StoryAccess"]] = relationship(back_populates="story")
+    tags: Mapped[List["Tag"]] = relationship(
+        secondary="story_tag", back_populates="stories"
+    )
+
+
+class Tag(Base):
+    __tablename__ = "tag"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    name: Mapped[str] = mapped_column(String(50), unique=True)
+
+    stories: Mapped[List["Story"]] = relationship(
+        secondary="story_tag", back_populates="tags"
+    )
+
+
+class StoryTag(Base):
+    __tablename__ = "story_tag"
+    __table_args__ = (Index("ix_story_tag_tag_id", "tag_id"),)
+
+    story_id: Mapped[int] = mapped_column(ForeignKey("story.id"), primary_key=True)
+    tag_id: Mapped[int] = mapped_column(ForeignKey("tag.id"), primary_key=True)
 
 
 class Stage(Base):
     __tablename__ = "stage"
+    __table_args__ = (
+        Index("ix_stage_story_id_level", "story_id", "level", unique=True),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     level: Mapped[int]
@@ -80,6 +119,7 @@ class Stage(Base):
 
 class Hint(Base):
     __tablename__ = "hint"
+    __table_args__ = (Index("ix_hint_stage_id_trigger", "stage_id", "trigger"),)
 
     id: Mapped[int] = mapped_column(primary_key=True)
     text: Mapped[str]
@@ -94,6 +134,9 @@ class Hint(Base):
 
 class StoryAccess(Base):
     __tablename__ = "story_access"
+    __table_args__ = (
+        Index("ix_story_access_user_id_story_id", "user_id", "story_id", unique=True),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("user.id"))
@@ -107,6 +150,8 @@ class StoryAccess(Base):
 
 class Attempt(Base):
     __tablename__ = "attempt"
+    # Ostatnia próba dostępu jest wyszukiwana po story_access_id i najwyższym id
+    __table_args__ = (Index("ix_attempt_story_access_id_id", "story_access_id", "id"),)
 
     id: Mapped[int] = mapped_column(primary_key=True)
     story_access_id: Mapped["StoryAccess"] = mapped_column(
@@ -128,6 +173,7 @@ class Attempt(Base):
 
 class PasswordAttempt(Base):
     __tablename__ = "password_attempt"
+    __table_args__ = (Index("ix_password_attempt_attempt_id", "attempt_id"),)
 
     id: Mapped[int] = mapped_column(primary_key=True)
     attempt_id: Mapped["Attempt"] = mapped_column(ForeignKey("attempt.id"))
@@ -141,6 +187,11 @@ class PasswordAttempt(Base):
 
 class HintsAttempt(Base):
     __tablename__ = "hints_attempt"
+    __table_args__ = (
+        Index(
+            "ix_hints_attempt_attempt_id_hint_id", "attempt_id", "hint_id", unique=True
+        ),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     attempt_id: Mapped["Attempt"] = mapped_column(ForeignKey("attempt.id"))
@@ -0,0 +1,141 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Hashable, Iterable, NamedTuple, Optional, Set
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.util import find_tables
+
+# Liczba zapamiętanych wyników i czas ich ważności w sekundach
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "1024"))
+QUERY_CACHE_TTL = float(os.getenv("QUERY_CACHE_TTL", "60"))
+
+_WRITTEN_TABLES = "query_cache_written_tables"
+
+
+class CachedResult(NamedTuple):
+    rows: tuple
+    tables: FrozenSet[str]
+    expires_at: float
+
+
+class QueryCache:
+    """
+    Process-local LRU of query results with table-level invalidation.
+
+    Entries keep column values of the loaded rows and the tables the query read.
+    Flushes and ORM INSERT/UPDATE/DELETE statements invalidate entries of the written
+    tables, again when the transaction ends. Writes of other processes are only
+    bounded by the TTL, so the cache is meant for rarely changing tables.
+    """
+
+    def __init__(self, maxsize: int = QUERY_CACHE_SIZE, ttl: float = QUERY_CACHE_TTL):
+        """
+        :param maxsize: Maximum number of cached results.
+        :param ttl: Seconds after which a result is loaded again.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.generation: int = 0
+        self._results: "OrderedDict[Hashable, CachedResult]" = OrderedDict()
+        self._keys_by_table: Dict[str, Set[Hashable]] = {}
+
+    def get(self, key: Hashable) -> Optional[tuple]:
+        cached = self._results.get(key)
+        if cached is None:
+            return None
+        if cached.expires_at <= time.monotonic():
+            self._remove(key)
+            return None
+        self._results.move_to_end(key)
+        return cached.rows
+
+    def set(
+        self, key: Hashable, rows: Iterable[Any], tables: Iterable[str], generation: int
+    ):
+        """
+        :param generation: Value of self.generation read before the query was executed,
+            the result isn't stored when tables were invalidated in the meantime.
+        """
+        if generation != self.generation:
+            return
+        self._remove(key)
+        tables = frozenset(tables)
+        self._results[key] = CachedResult(
+            rows=tuple(rows), tables=tables, expires_at=time.monotonic() + self.ttl
+        )
+        for table in tables:
+            self._keys_by_table.setdefault(table, set()).add(key)
+        while len(self._results) > self.maxsize:
+            self._remove(next(iter(self._results)))
+
+    def invalidate(self, tables: Iterable[str]):
+        self.generation += 1
+        for table in tables:
+            for key in self._keys_by_table.pop(table, set()):
+                self._remove(key)
+
+    def clear(self):
+        self.generation += 1
+        self._results.clear()
+        self._keys_by_table.clear()
+
+    def _remove(self, key: Hashable):
+        cached = self._results.pop(key, None)
+        if cached is None:
+            return
+        for table in cached.tables:
+            keys = self._keys_by_table.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_table[table]
+
+
+query_cache = QueryCache()
+
+
+def statement_tables(stmt) -> FrozenSet[str]:
+    return frozenset(table.name for table in find_tables(stmt, include_joins=True))
+
+
+def has_pending_writes(session: Session, tables: Iterable[str]) -> bool:
+    """Results read inside a transaction which wrote to the tables mustn't be cached."""
+    return not set(session.info.get(_WRITTEN_TABLES, ())).isdisjoint(tables)
+
+
+def _mark_written(session: Session, tables: Set[str]):
+    if tables:
+        session.info.setdefault(_WRITTEN_TABLES, set()).update(tables)
+        query_cache.invalidate(tables)
+
+
+@event.listens_for(Session, "after_flush")
+def _invalidate_flushed_tables(session: Session, flush_context):
+    tables = set()
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        table = getattr(instance, "__table__", None)
+        if table is not None:
+            tables.add(table.name)
+    _mark_written(session, tables)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _invalidate_written_tables(orm_execute_state):
+    if (
+        orm_execute_state.is_insert
+        or orm_execute_state.is_update
+        or orm_execute_state.is_delete
+    ):
+        table = orm_execute_state.statement.table
+        _mark_written(orm_execute_state.session, {table.name})
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _invalidate_on_transaction_end(session: Session):
+    # Inne sesje mogły zapamiętać wynik sprzed zatwierdzenia zmian
+    tables = session.info.pop(_WRITTEN_TABLES, None)
+    if tables:
+        query_cache.invalidate(tables)
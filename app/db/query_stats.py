@@ -0,0 +1,97 @@
+import logging
+import os
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional, Dict
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+# Nagłówki ze statystykami zapytań są dodawane tylko w trybie debug
+QUERY_STATS_HEADERS = os.getenv("DEBUG", "false").lower() in ("1", "true", "yes")
+# Maksymalna liczba zapytań SQL na jedno żądanie, po przekroczeniu logowane jest ostrzeżenie
+QUERY_BUDGET = int(os.getenv("QUERY_BUDGET", "8"))
+
+
+class QueryStats:
+    """Statements executed while handling one request."""
+
+    def __init__(self):
+        self.count: int = 0
+        self.total_time: float = 0.0
+        self.statements: Counter = Counter()
+
+    @property
+    def repeated(self) -> int:
+        """Number of executions repeating an identical statement, a sign of N+1 queries."""
+        return sum(count - 1 for count in self.statements.values() if count > 1)
+
+    def as_headers(self) -> Dict[str, str]:
+        return {
+            "X-DB-Query-Count": str(self.count),
+            "X-DB-Query-Time-Ms": f"{self.total_time * 1000:.2f}",
+            "X-DB-Repeated-Queries": str(self.repeated),
+        }
+
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar(
+    "query_stats", default=None
+)
+
+
+def start_query_stats() -> QueryStats:
+    """Start counting statements executed in the current context."""
+    stats = QueryStats()
+    _current_stats.set(stats)
+    return stats
+
+
+def get_query_stats() -> Optional[QueryStats]:
+    return _current_stats.get()
+
+
+@contextmanager
+def use_query_stats(stats: Optional[QueryStats]) -> Iterator[None]:
+    """Count statements executed inside the block into stats, e.g. of another request."""
+    token = _current_stats.set(stats)
+    try:
+        yield
+    finally:
+        _current_stats.reset(token)
+
+
+def register_query_stats(async_engine: AsyncEngine):
+    """Count statements and their execution time for the request being handled."""
+
+    @event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, many):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(async_engine.sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, many):
+        start_time = conn.info["query_start_time"].pop()
+        stats = _current_stats.get()
+        if stats is None:
+            return
+        stats.count += 1
+        stats.total_time += time.perf_counter() - start_time
+        stats.statements[(statement, str(parameters))] += 1
+
+
+def check_query_budget(stats: QueryStats, endpoint: str, budget: int = QUERY_BUDGET):
+    """Log a warning when the endpoint executed more statements than the budget allows."""
+    if stats.count > budget:
+        logger.warning(
+            "%s executed %s SQL statements (budget %s, %s repeated, %.2f ms)",
+            endpoint,
+            stats.count,
+            budget,
+            stats.repeated,
+            stats.total_time * 1000,
+        )
+        return False
+    return True
@@ -0,0 +1,136 @@
+import html
+import re
+from typing import List, NamedTuple, Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import Story
+
+# Tabela FTS5 z zewnętrzną zawartością, treść jest czytana z tabeli story,
+# triggery utrzymują indeks przy każdym INSERT, UPDATE i DELETE
+STORY_SEARCH_DDL = (
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS story_fts USING fts5(
+        title, description, content='story', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS story_fts_after_insert AFTER INSERT ON story BEGIN
+        INSERT INTO story_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS story_fts_after_delete AFTER DELETE ON story BEGIN
+        INSERT INTO story_fts(story_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS story_fts_after_update AFTER UPDATE ON story BEGIN
+        INSERT INTO story_fts(story_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO story_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+)
+
+# Tytuł waży więcej niż opis w rankingu BM25
+TITLE_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+SNIPPET_TOKENS = 12
+# Znaczniki bez znaczenia w HTML, zamieniane na <mark> po escapowaniu fragmentu
+_MARK_START = "\x02"
+_MARK_END = "\x03"
+
+_SEARCH_STATEMENT = text(f"""
+    SELECT story.id AS id,
+           bm25(story_fts, {TITLE_WEIGHT}, {DESCRIPTION_WEIGHT}) AS rank,
+           snippet(story_fts, 0, '{_MARK_START}', '{_MARK_END}', '…', {SNIPPET_TOKENS})
+               AS title_snippet,
+           snippet(story_fts, 1, '{_MARK_START}', '{_MARK_END}', '…', {SNIPPET_TOKENS})
+               AS description_snippet
+    FROM story_fts
+    JOIN story ON story.id = story_fts.rowid
+    WHERE story_fts MATCH :query
+    ORDER BY rank, story.id
+    LIMIT :limit OFFSET :offset
+    """)
+
+
+def create_story_search(connection):
+    """Create the FTS5 table with its triggers, a new table is filled from story."""
+    exists = connection.exec_driver_sql(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'story_fts'"
+    ).first()
+    for statement in STORY_SEARCH_DDL:
+        connection.exec_driver_sql(statement)
+    if not exists:
+        connection.exec_driver_sql(
+            "INSERT INTO story_fts(story_fts) VALUES ('rebuild')"
+        )
+
+
+@event.listens_for(Story.__table__, "after_create")
+def _create_story_search(target, connection, **kwargs):
+    create_story_search(connection)
+
+
+@event.listens_for(Story.__table__, "before_drop")
+def _drop_story_search(target, connection, **kwargs):
+    connection.exec_driver_sql("DROP TABLE IF EXISTS story_fts")
+
+
+def build_match_query(query: str) -> Optional[str]:
+    """
+    Turn user input into a safe FTS5 query.
+
+    Every word is quoted, so FTS5 operators in the input have no effect, and the last
+    word is matched as a prefix for search-as-you-type.
+    """
+    words = re.findall(r"\w+", query)
+    if not words:
+        return None
+    phrases = [f'"{word}"' for word in words]
+    phrases[-1] += "*"
+    return " ".join(phrases)
+
+
+def highlight(snippet: str) -> str:
+    escaped = html.escape(snippet)
+    return escaped.replace(_MARK_START, "<mark>").replace(_MARK_END, "</mark>")
+
+
+class SearchHit(NamedTuple):
+    story_id: int
+    rank: float
+    title_snippet: str
+    description_snippet: str
+
+
+async def search_stories(
+    db: AsyncSession, query: str, offset: int = 0, limit: int = 20
+) -> List[SearchHit]:
+    """
+    Return stories matching the query ordered by BM25 rank, best first.
+
+    Snippets are HTML-escaped, matched words are wrapped in <mark>.
+    """
+    match_query = build_match_query(query)
+    if match_query is None:
+        return []
+    result = await db.execute(
+        _SEARCH_STATEMENT, {"query": match_query, "limit": limit, "offset": offset}
+    )
+    return [
+        SearchHit(
+            story_id=row.id,
+            rank=row.rank,
+            title_snippet=highlight(row.title_snippet),
+            description_snippet=highlight(row.description_snippet),
+        )
+        for row in result
+    ]
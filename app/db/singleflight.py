@@ -0,0 +1,33 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls into one execution.
+
+    Callers asking for a key while its call is in flight await the same result or error
+    instead of running the call again. Nothing is kept after the call finishes, so the
+    next caller always gets a fresh result. The result is shared between callers and
+    mustn't be mutated.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        :param key: Identifies calls which return the same result.
+        :param call: Started only when no call with the key is in flight.
+        """
+        future = self._calls.get(key)
+        if future is None:
+            future = asyncio.ensure_future(call())
+            self._calls[key] = future
+            future.add_done_callback(lambda done: self._discard(key, done))
+        # Anulowanie jednego z oczekujących nie może przerwać wspólnego wywołania
+        return await asyncio.shield(future)
+
+    def _discard(self, key: Hashable, future: asyncio.Future):
+        if self._calls.get(key) is future:
+            del self._calls[key]
@@ -0,0 +1,187 @@
+import json
+import logging
+import os
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+from uuid import UUID
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError, WatchError
+
+from app.schemas.access import StoryStatus
+from app.users.auth import redis
+
+logger = logging.getLogger(__name__)
+
+# Czas życia hasha ze statusami historii użytkownika w sekundach
+STATUS_CACHE_TTL = int(os.getenv("STATUS_CACHE_TTL", "3600"))
+# Wersja formatu wpisów, zmiana schematu StoryStatus wymaga jej podbicia
+STATUS_CACHE_VERSION = 1
+
+
+class StoryStatusCache:
+    """
+    Redis hash per user with the StoryStatus of every story the user checked.
+
+    Mutations write their new status through with set(), statuses loaded from the
+    database are stored with fill(), which never overwrites an existing entry, so a read
+    started before a mutation can't replace its newer status. Redis errors are logged
+    and treated as a cache miss. Next to the statuses it keeps a bitset of the stories
+    owned by the user.
+    """
+
+    def __init__(self, redis_client: Redis, ttl: int = STATUS_CACHE_TTL):
+        """
+        :param redis_client: Redis client created with decode_responses=True.
+        :param ttl: Seconds after the last write when the whole user hash expires.
+        """
+        self.redis = redis_client
+        self.ttl = ttl
+
+    @staticmethod
+    def key(user_id: UUID) -> str:
+        return f"story_status:v{STATUS_CACHE_VERSION}:{user_id}"
+
+    @staticmethod
+    def owned_key(user_id: UUID) -> str:
+        return f"owned_stories:{user_id}"
+
+    @staticmethod
+    def owned_version_key(user_id: UUID) -> str:
+        return f"owned_stories_version:{user_id}"
+
+    async def get_owned_stories(
+        self, user_id: UUID, load: Callable[[], Awaitable[Iterable[int]]]
+    ) -> int:
+        """
+        Return the bitset of ids of stories owned by the user, bit n is story n.
+
+        The bitset is kept in Redis as a hex string. On a miss it is built from the ids
+        returned by load and stored only when no purchase happened in the meantime.
+        """
+        key = self.owned_key(user_id)
+        version_key = self.owned_version_key(user_id)
+        try:
+            bitset, version = await self.redis.mget(key, version_key)
+        except RedisError as error:
+            logger.warning("Owned stories cache read failed: %s", error)
+            bitset, version = None, None
+        if bitset is not None:
+            return int(bitset, 16)
+
+        owned = 0
+        for story_id in await load():
+            owned |= 1 << story_id
+        try:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                await pipe.watch(version_key)
+                if await pipe.get(version_key) == version:
+                    pipe.multi()
+                    pipe.set(key, format(owned, "x"), ex=self.ttl)
+                    await pipe.execute()
+        except WatchError:
+            pass
+        except RedisError as error:
+            logger.warning("Owned stories cache write failed: %s", error)
+        return owned
+
+    async def invalidate_owned_stories(self, user_id: UUID):
+        """Drop the bitset after a purchase, the version keeps older loads out."""
+        try:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.incr(self.owned_version_key(user_id))
+                pipe.expire(self.owned_version_key(user_id), self.ttl)
+                pipe.delete(self.owned_key(user_id))
+                await pipe.execute()
+        except RedisError as error:
+            logger.warning("Owned stories cache invalidation failed: %s", error)
+
+    async def get(self, user_id: UUID, story_id: int) -> Optional[StoryStatus]:
+        try:
+            value = await self.redis.hget(self.key(user_id), str(story_id))
+        except RedisError as error:
+            logger.warning("Story status cache read failed: %s", error)
+            return None
+        if value is None:
+            return None
+        entry = json.loads(value)
+        if entry.get("version") != STATUS_CACHE_VERSION:
+            return None
+        return StoryStatus.model_validate(entry["status"])
+
+    async def get_many(
+        self, user_id: UUID, story_ids: List[int]
+    ) -> Dict[int, StoryStatus]:
+        """Return the cached statuses of the stories, misses are left out."""
+        try:
+            values = await self.redis.hmget(
+                self.key(user_id), [str(i) for i in story_ids]
+            )
+        except RedisError as error:
+            logger.warning("Story status cache read failed: %s", error)
+            return {}
+        statuses = {}
+        for story_id, value in zip(story_ids, values):
+            if value is None:
+                continue
+            entry = json.loads(value)
+            if entry.get("version") == STATUS_CACHE_VERSION:
+                statuses[story_id] = StoryStatus.model_validate(entry["status"])
+        return statuses
+
+    async def set(self, user_id: UUID, story_id: int, status: StoryStatus):
+        """Write through the status of a story changed by a mutation."""
+        await self._store(user_id, story_id, status, overwrite=True)
+
+    async def fill(self, user_id: UUID, story_id: int, status: StoryStatus):
+        """Store a status loaded from the database unless a newer one was written."""
+        await self._store(user_id, story_id, status, overwrite=False)
+
+    async def fill_many(self, user_id: UUID, statuses: Dict[int, StoryStatus]):
+        """Store many statuses loaded from the database with one round trip."""
+        await self._store_many(user_id, statuses, overwrite=False)
+
+    async def _store(
+        self, user_id: UUID, story_id: int, status: StoryStatus, overwrite: bool
+    ):
+        await self._store_many(user_id, {story_id: status}, overwrite)
+
+    async def _store_many(
+        self, user_id: UUID, statuses: Dict[int, StoryStatus], overwrite: bool
+    ):
+        if not statuses:
+            return
+        key = self.key(user_id)
+        try:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                for story_id, status in statuses.items():
+                    value = json.dumps(
+                        {
+                            "version": STATUS_CACHE_VERSION,
+                            "status": status.model_dump(mode="json"),
+                        }
+                    )
+                    if overwrite:
+                        pipe.hset(key, str(story_id), value)
+                    else:
+                        pipe.hsetnx(key, str(story_id), value)
+                pipe.expire(key, self.ttl)
+                await pipe.execute()
+        except RedisError as error:
+            logger.warning("Story status cache write failed: %s", error)
+            if overwrite:
+                await self._discard(key, list(statuses))
+
+    async def _discard(self, key: str, story_ids: List[int]):
+        # Status sprzed mutacji nie może być serwowany do końca TTL, po usunięciu
+        # zostanie wczytany z bazy
+        try:
+            await self.redis.hdel(key, *(str(story_id) for story_id in story_ids))
+        except RedisError as error:
+            logger.warning("Story status cache invalidation failed: %s", error)
+
+
+status_cache = StoryStatusCache(redis)
+
+
+def get_status_cache() -> StoryStatusCache:
+    return status_cache
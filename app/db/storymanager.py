@@ -1,23 +1,41 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import Optional, List
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.attributes import set_committed_value
+from datetime import datetime
+from typing import Optional, Any, Dict, Iterable, List, Tuple
 from fastapi import Depends
-from app.db.models import User, Story, Attempt, StoryAccess, Stage
-from app.db.database import get_async_session
+from app.db.models import User, Attempt, StoryAccess
+from app.db.database import (
+    get_async_session,
+    get_async_read_session,
+    get_write_executor,
+)
+from app.db.writer import WriteExecutor, WriteWork
+from app.db.status_cache import StoryStatusCache, get_status_cache
 from app.users.manager import current_active_user
+from app.users.auth import get_user_cache
+from app.users.user_cache import UserCache
 
 from app.db.db_attempt import (
-    get_active_attempt,
     get_hints,
+    get_hints_summary,
     create_first_attempt,
     add_password_attempt,
-    check_new_hint,
+    is_hint_discovered,
+    add_hints_attempt,
     finish_attempt,
     create_next_attempt,
 )
-from app.db.db_access import get_story_access_by_attempt, get_story_access
-from app.db.db_story import get_story_by_id, get_all_stories
-from app.db.db_queries import convert_to_pydantic
-from app.db.db_stage import get_next_stage, get_stage_by_attempt
+from app.db.db_access import (
+    get_attempt_progress,
+    get_access_progress,
+    get_access_progress_many,
+    get_owned_story_ids,
+)
+from app.db.catalog import catalog, CatalogSnapshot, StoryEntry, StageEntry
+from app.db.id_filter import attempt_ids
+from app.db.db_queries import convert_to_pydantic, add_instance
 
 from app.schemas.access import StoryStatus, StatusEnum, StoryAccessBase, AttemptBase
 from app.schemas.attempt import (
@@ -37,61 +55,137 @@ from app.exceptions.exceptions import (
 
 
 class StoryManager:
-    def __init__(self, session: AsyncSession, current_user: User):
+    def __init__(
+        self,
+        session: AsyncSession,
+        current_user: User,
+        read_session: Optional[AsyncSession] = None,
+        writer: Optional[WriteExecutor] = None,
+        status_cache: Optional[StoryStatusCache] = None,
+        user_cache: Optional[UserCache] = None,
+    ):
         """
         Initializes the StoryManager with a database session and the current user.
 
         :param session: AsyncSession instance for database operations.
         :param current_user: Current authenticated User instance.
+        :param read_session: Read-only AsyncSession used by loads which don't lead to
+            mutations. Falls back to session.
+        :param writer: WriteExecutor used for mutations. Without it mutations are
+            committed directly on session.
+        :param status_cache: StoryStatusCache serving check_access and receiving
+            statuses changed by mutations. Without it statuses are always loaded.
+        :param user_cache: UserCache invalidated when the user's gold changes.
         """
         self.db: AsyncSession = session
+        self.read_db: AsyncSession = read_session or session
+        self.writer: Optional[WriteExecutor] = writer
+        self.status_cache: Optional[StoryStatusCache] = status_cache
+        self.user_cache: Optional[UserCache] = user_cache
         self.user: User = current_user
-        self.story: Optional[Story] = None
+        self.story: Optional[StoryEntry] = None
         self.story_access: Optional[StoryAccess] = None
         self.current_attempt: Optional[Attempt] = None
-        self.stage: Optional[Stage] = None
+        self.stage: Optional[StageEntry] = None
         self.story_status: Optional[StatusEnum] = StatusEnum.new
         self.attempt_finished: bool = False
 
-    async def load_by_story_id(self, story_id: int):
+    async def write(self, work: WriteWork) -> Any:
+        """
+        Runs the mutation and commits it.
+
+        With a WriteExecutor the work is group-committed by the single writer task,
+        otherwise it is executed directly on the session.
+
+        :param work: Async function receiving the session used for writing.
+        :return: Result of the work.
+        """
+        if self.writer:
+            return await self.writer.submit(work)
+        try:
+            result = await work(self.db)
+            await self.db.commit()
+        except Exception:
+            await self.db.rollback()
+            raise
+        return result
+
+    async def _get_snapshot(
+        self, story_ids: Iterable[int] = (), stage_ids: Iterable[int] = ()
+    ) -> CatalogSnapshot:
+        """
+        Returns the catalog snapshot, reloaded once when it misses a requested story
+        or stage, which may have been created by another worker.
+        """
+        snapshot = await catalog.get_snapshot(self.read_db)
+        if all(snapshot.get_story(story_id) for story_id in story_ids) and all(
+            snapshot.get_stage(stage_id) for stage_id in stage_ids
+        ):
+            return snapshot
+        return await catalog.reload_on_miss(self.read_db)
+
+    async def load_story(self, story_id: int):
+        """
+        Loads only the story from the catalog snapshot, without the user's access.
+
+        :param story_id: ID of the story to load.
+        """
+        snapshot = await self._get_snapshot(story_ids=[story_id])
+        self.story = snapshot.get_story(story_id)
+        if not self.story:
+            raise EntityDoesNotExistError(f"Story with id {story_id} not found.")
+
+    async def load_by_story_id(self, story_id: int, read_only: bool = False):
         """
         Loads story and its access information by story_id.
 
         :param story_id: ID of the story to load.
+        :param read_only: Load with the read-only session, loaded objects can't be mutated.
         """
-        self.story = await get_story_by_id(self.db, story_id)
+        db = self.read_db if read_only else self.db
+        snapshot = await self._get_snapshot(story_ids=[story_id])
+        self.story = snapshot.get_story(story_id)
         if not self.story:
             raise EntityDoesNotExistError(f"Story with id {story_id} not found.")
 
-        story_access = await get_story_access(self.db, self.user, story_id)
+        story_access, current_attempt = await get_access_progress(
+            db, self.user, story_id
+        )
         if story_access:
             self.story_access = story_access
-            self.story_status = StatusEnum.purchased
-
-            self.current_attempt = await get_active_attempt(
-                self.db, self.story_access.id
-            )
+            self.current_attempt = current_attempt
             if self.current_attempt:
-                self.stage = await get_stage_by_attempt(self.db, self.current_attempt)
-                self.story_status = StatusEnum.started
-                if self.current_attempt.finish_date:
-                    self.story_status = StatusEnum.ended
-            else:
-                self.story_status = StatusEnum.purchased
+                stage_id = self.current_attempt.stage_id
+                snapshot = await self._get_snapshot(stage_ids=[stage_id])
+                self.stage = snapshot.get_stage(stage_id)
+            self.story_status = self._progress_status(story_access, current_attempt)
 
-    async def load_by_attempt_id(self, attempt_id: int):
+    async def load_by_attempt_id(self, attempt_id: int, read_only: bool = False):
         """
         Loads story and current attempt information by attempt_id.
 
         :param attempt_id: ID of the attempt to load.
+        :param read_only: Load with the read-only session, loaded objects can't be mutated.
         """
-        self.story_access = await get_story_access_by_attempt(
-            self.db, attempt_id, self.user
+        db = self.read_db if read_only else self.db
+        # Nieistniejące id są odrzucane bez zapytania do bazy
+        if not await attempt_ids.might_exist(self.read_db, attempt_id):
+            raise EntityDoesNotExistError(
+                message=f"Attempt with {attempt_id} id does not exist"
+            )
+        self.story_access, self.current_attempt = await get_attempt_progress(
+            db, attempt_id, self.user
         )
-
-        self.story = self.story_access.story
-        self.current_attempt = await get_active_attempt(self.db, self.story_access.id)
-        self.stage = await get_stage_by_attempt(self.db, self.current_attempt)
+        snapshot = await self._get_snapshot(
+            story_ids=[self.story_access.story_id],
+            stage_ids=[self.current_attempt.stage_id],
+        )
+        self.story = snapshot.get_story(self.story_access.story_id)
+        self.stage = snapshot.get_stage(self.current_attempt.stage_id)
+        if not self.stage:
+            raise EntityDoesNotExistError(
+                f"Stage with id {self.current_attempt.stage_id} not found."
+            )
         # Sytuacja w której zostanie podany attempt_id który został już rozwiązany
         # Należy przenieść historię do aktualnego lub stowrzyć stronę ze wskazaniem na aktualny
         if self.current_attempt.id != attempt_id:
@@ -104,46 +198,105 @@ class StoryManager:
             self.story_status = StatusEnum.started
 
     async def check_access(self) -> StoryStatus:
+        return self._build_status(self.story_status, self.current_attempt)
 
-        if self.story_status == StatusEnum.new:
-            result_status = StoryStatus(status=self.story_status, story_access=None)
-        elif self.story_status == StatusEnum.purchased:
-            result_status = StoryStatus(
-                status=self.story_status,
-                story_access=StoryAccessBase(
-                    purchase_date=self.story_access.purchase_date, current_attempt=None
-                ),
-            )
-        elif self.story_status == StatusEnum.started:
-            result_status = StoryStatus(
-                status=self.story_status,
-                story_access=StoryAccessBase(
-                    purchase_date=self.story_access.purchase_date,
-                    current_attempt=AttemptBase(
-                        id=self.current_attempt.id,
-                        story_access_id=self.story_access.id,
-                        stage_id=self.current_attempt.stage_id,
-                        start_date=self.current_attempt.start_date,
-                        finish_date=self.current_attempt.finish_date,
-                    ),
-                ),
+    async def get_story_status(self, story_id: int) -> StoryStatus:
+        """
+        Returns the status of the story, from the status cache when possible.
+
+        :param story_id: ID of the story to check.
+        """
+        if self.status_cache:
+            cached_status = await self.status_cache.get(self.user.id, story_id)
+            if cached_status:
+                return cached_status
+
+        await self.load_by_story_id(story_id, read_only=True)
+        story_status = await self.check_access()
+        if self.status_cache:
+            await self.status_cache.fill(self.user.id, story_id, story_status)
+        return story_status
+
+    async def get_story_statuses(self, story_ids: List[int]) -> Dict[int, StoryStatus]:
+        """
+        Returns the statuses of many stories.
+
+        Statuses missing in the status cache are loaded with one query.
+
+        :param story_ids: IDs of the stories to check.
+        """
+        story_ids = list(dict.fromkeys(story_ids))
+        snapshot = await self._get_snapshot(story_ids=story_ids)
+        for story_id in story_ids:
+            if not snapshot.get_story(story_id):
+                raise EntityDoesNotExistError(f"Story with id {story_id} not found.")
+
+        statuses = {}
+        if self.status_cache:
+            statuses = await self.status_cache.get_many(self.user.id, story_ids)
+        missing = [story_id for story_id in story_ids if story_id not in statuses]
+        if not missing:
+            return {story_id: statuses[story_id] for story_id in story_ids}
+
+        progress = await get_access_progress_many(self.read_db, self.user, missing)
+        loaded = {}
+        for story_id in missing:
+            story_access, attempt = progress.get(story_id, (None, None))
+            loaded[story_id] = self._build_status(
+                self._progress_status(story_access, attempt), attempt, story_access
             )
-        else:
-            result_status = StoryStatus(
-                status=self.story_status,
-                story_access=StoryAccessBase(
-                    purchase_date=self.story_access.purchase_date,
-                    current_attempt=AttemptBase(
-                        id=self.current_attempt.id,
-                        story_access_id=self.story_access.id,
-                        stage_id=self.current_attempt.stage_id,
-                        start_date=self.current_attempt.start_date,
-                        finish_date=self.current_attempt.finish_date,
-                    ),
-                ),
+        if self.status_cache:
+            await self.status_cache.fill_many(self.user.id, loaded)
+        statuses.update(loaded)
+        return {story_id: statuses[story_id] for story_id in story_ids}
+
+    @staticmethod
+    def _progress_status(
+        story_access: Optional[StoryAccess], attempt: Optional[Attempt]
+    ) -> StatusEnum:
+        if not story_access:
+            return StatusEnum.new
+        if not attempt:
+            return StatusEnum.purchased
+        if attempt.finish_date:
+            return StatusEnum.ended
+        return StatusEnum.started
+
+    def _build_status(
+        self,
+        status: StatusEnum,
+        attempt: Optional[Attempt],
+        story_access: Optional[StoryAccess] = None,
+    ) -> StoryStatus:
+        story_access = story_access or self.story_access
+        if status == StatusEnum.new:
+            return StoryStatus(status=status, story_access=None)
+
+        current_attempt = None
+        if status != StatusEnum.purchased:
+            current_attempt = AttemptBase(
+                id=attempt.id,
+                story_access_id=story_access.id,
+                stage_id=attempt.stage_id,
+                start_date=attempt.start_date,
+                finish_date=attempt.finish_date,
             )
+        return StoryStatus(
+            status=status,
+            story_access=StoryAccessBase(
+                purchase_date=story_access.purchase_date,
+                current_attempt=current_attempt,
+            ),
+        )
 
-        return result_status
+    async def _write_status(
+        self, status: StatusEnum, attempt: Optional[Attempt] = None
+    ):
+        """Writes the status changed by a mutation through to the status cache."""
+        if self.status_cache:
+            await self.status_cache.set(
+                self.user.id, self.story.id, self._build_status(status, attempt)
+            )
 
     async def buy_story(self):
         """
@@ -160,20 +313,42 @@ class StoryManager:
         if self.user.gold < self.story.cost:
             raise InsufficientGoldError("Insufficient gold to purchase the story.")
 
-        # Deduct the cost from the user's gold
-        self.user.gold -= self.story.cost
-        self.db.add(self.user)
+        cost = self.story.cost
+        user_id = self.user.id
+        story_id = self.story.id
+
+        async def purchase(session: AsyncSession) -> StoryAccess:
+            # Deduct the cost from the user's gold, the condition in SQL keeps
+            # concurrent purchases from going below zero
+            result = await session.execute(
+                update(User)
+                .where(User.id == user_id, User.gold >= cost)
+                .values(gold=User.gold - cost)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount == 0:
+                raise InsufficientGoldError("Insufficient gold to purchase the story.")
 
-        # Create a new StoryAccess record
-        new_access = StoryAccess(user_id=self.user.id, story_id=self.story.id)
-        self.db.add(new_access)
+            # Create a new StoryAccess record
+            return await add_instance(
+                session, StoryAccess, user_id=user_id, story_id=story_id
+            )
 
-        # Commit the transaction
-        await self.db.commit()
+        try:
+            new_access = await self.write(purchase)
+        except IntegrityError:
+            raise StoryAlreadyOwnedError("User already owns this story.")
+        set_committed_value(self.user, "gold", self.user.gold - cost)
+        if self.status_cache:
+            await self.status_cache.invalidate_owned_stories(user_id)
+        # Zapamiętany stan złota użytkownika jest nieaktualny
+        if self.user_cache:
+            await self.user_cache.invalidate_user(user_id)
 
         # Update the StoryManager state
         self.story_access = new_access
         self.story_status = StatusEnum.purchased
+        await self._write_status(self.story_status)
         if self.story_access:
             return True
         return False
@@ -193,11 +368,16 @@ class StoryManager:
         if self.current_attempt:
             raise StoryAlreadyStartedError("User has already started this story")
 
-        self.current_attempt = await create_first_attempt(
-            db=self.db,
-            story_access=self.story_access,
-        )
+        story_access = self.story_access
+
+        async def start(session: AsyncSession) -> Attempt:
+            return await create_first_attempt(
+                db=session, story_access=story_access, commit=False
+            )
+
+        self.current_attempt = await self.write(start)
         self.story_status = StatusEnum.started
+        await self._write_status(self.story_status, self.current_attempt)
 
     async def validate_password(self, password: str) -> PasswordCheckDisplay:
         password_result = PasswordCheckDisplay(
@@ -208,44 +388,85 @@ class StoryManager:
         )
         if not password:
             raise EmptyPasswordFormError(message="Password from shouldn't be empty")
-        # Dodaje nowe hasło do histori nie zależnie od poprawności
-        await add_password_attempt(self.db, self.current_attempt, password)
+        # Hasło i wyzwalacze wskazówek są porównywane z prekompilowanym matcherem
+        # etapu, błędna odpowiedź bez wskazówki nie wykonuje żadnego odczytu
+        snapshot = await catalog.get_snapshot(self.read_db)
+        matcher = snapshot.get_matcher(self.stage.id)
+        is_correct = matcher.is_answer(password)
+        next_stage = snapshot.get_next_stage(self.stage) if is_correct else None
 
         # Sprawdza, czy wprowadzone hasło wyzwala jakąś wskazówkę
-        if await check_new_hint(self.db, self.current_attempt, password):
+        new_hint = matcher.get_hint(password)
+        if new_hint and await is_hint_discovered(
+            self.read_db, self.current_attempt, new_hint
+        ):
+            new_hint = None
+        if new_hint:
             password_result.new_hint = True
             password_result.message = "Nowa wskazowka zostala odkryta"
 
         # Sprawdza, czy wprowadzone hasło jest prawidłowe. Jeżeli jest kolejny etap to wysyła id,
         # a jeżeli niema to kończy historię
-        # if await check_stage_password(self.db, self.current_attempt.stage, password):
-        if self.stage.password == password:
-            self.current_attempt = await finish_attempt(self.db, self.current_attempt)
-            next_stage = await get_next_stage(self.db, self.current_attempt.stage)
+        if is_correct:
             if next_stage:
-                new_attemp = await create_next_attempt(
-                    self.db,
-                    self.current_attempt,
-                    next_stage,
-                )
-                password_result.next_attempt = new_attemp.id
                 password_result.message = "Gratulacje, to prawidlowa odpowiedz"
             else:
-
                 password_result.message = "Gratulacje, historia zostala zakonczona"
                 password_result.end_story = True
 
+        attempt = self.current_attempt
+
+        async def record_password(session: AsyncSession) -> Optional[Attempt]:
+            if new_hint and not await add_hints_attempt(
+                session, attempt, new_hint, commit=False
+            ):
+                # Równoległe żądanie zapisało już tę wskazówkę
+                password_result.new_hint = False
+                if not is_correct:
+                    password_result.message = "Nieprawidłowa odpowiedź, próbuj dalej"
+            # Dodaje nowe hasło do histori nie zależnie od poprawności
+            await add_password_attempt(session, attempt, password, commit=False)
+            if is_correct:
+                await finish_attempt(session, attempt, commit=False)
+                if next_stage:
+                    new_attempt = await create_next_attempt(
+                        session, attempt, next_stage, commit=False
+                    )
+                    await session.flush()
+                    return new_attempt
+            return None
+
+        new_attempt = await self.write(record_password)
+        if new_attempt:
+            password_result.next_attempt = new_attempt.id
+            await self._write_status(StatusEnum.started, new_attempt)
+        elif is_correct:
+            await self._write_status(StatusEnum.ended, attempt)
+
         return password_result
 
     async def get_hints(self) -> HintsDisplay:
-        hints = await get_hints(self.db, self.current_attempt.id)
+        hints = await get_hints(self.read_db, self.current_attempt.id)
         return HintsDisplay(hints=convert_to_pydantic(hints, HintBase))
 
-    async def get_stories(self) -> List[Story]:
-        stories = await get_all_stories(self.db)
-        return stories
+    async def get_hints_summary(self) -> Tuple[int, Optional[datetime]]:
+        """Number of hints discovered in the current attempt and the last discovery date."""
+        return await get_hints_summary(self.read_db, self.current_attempt.id)
+
+    async def get_stories(self) -> Tuple[StoryEntry, ...]:
+        snapshot = await catalog.get_snapshot(self.read_db)
+        return snapshot.stories
+
+    async def get_owned_stories(self) -> int:
+        """Bitset of ids of stories owned by the user, bit n is story n."""
+        if not self.status_cache:
+            story_ids = await get_owned_story_ids(self.read_db, self.user)
+            return sum(1 << story_id for story_id in set(story_ids))
+        return await self.status_cache.get_owned_stories(
+            self.user.id, lambda: get_owned_story_ids(self.read_db, self.user)
+        )
 
-    async def get_story(self) -> Story:
+    async def get_story(self) -> StoryEntry:
         return self.story
 
     async def get_story_access(self) -> StoryAccess:
@@ -266,6 +487,10 @@ class StoryManager:
 
 async def get_story_manager(
     session: AsyncSession = Depends(get_async_session),
+    read_session: AsyncSession = Depends(get_async_read_session),
+    writer: WriteExecutor = Depends(get_write_executor),
+    status_cache: StoryStatusCache = Depends(get_status_cache),
+    user_cache: UserCache = Depends(get_user_cache),
     user: User = Depends(current_active_user),
 ) -> StoryManager:
     """
@@ -273,4 +498,11 @@ async def get_story_manager(
     """
     if not user:
         raise HTTPException(status_code=401, detail="Unauthorized user")
-    return StoryManager(session=session, current_user=user)
+    return StoryManager(
+        session=session,
+        current_user=user,
+        read_session=read_session,
+        writer=writer,
+        status_cache=status_cache,
+        user_cache=user_cache,
+    )
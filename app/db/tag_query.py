@@ -0,0 +1,125 @@
+import re
+from typing import Callable, List, NamedTuple, Set
+
+from app.exceptions.exceptions import InvalidTagQueryError
+
+# Tagi mogą zawierać litery z ogonkami, cyfry, myślniki i podkreślenia, tagi ze
+# spacjami podaje się w cudzysłowie, np. "Test type"
+_TOKEN_PATTERN = re.compile(r'\s*(?:"([^"]+)"|(\(|\)|[\w-]+))', re.UNICODE)
+_OPERATORS = {"AND", "OR", "NOT"}
+# Ograniczenia chronią parser rekurencyjny przed przepełnieniem stosu
+MAX_TAG_QUERY_LENGTH = 500
+MAX_TAG_QUERY_DEPTH = 32
+
+TAG = "TAG"
+
+
+class TagToken(NamedTuple):
+    """Token of a tag query, kind is AND, OR, NOT, a parenthesis or TAG."""
+
+    kind: str
+    value: str
+
+
+def tokenize_tag_query(query: str) -> List[TagToken]:
+    """
+    Split the query into tokens, operators are matched case-insensitively.
+
+    :raises InvalidTagQueryError: On unexpected characters or a too long query.
+    """
+    if len(query) > MAX_TAG_QUERY_LENGTH:
+        raise InvalidTagQueryError(
+            message=f"Tag query longer than {MAX_TAG_QUERY_LENGTH} characters"
+        )
+    tokens = []
+    position = 0
+    query = query.rstrip()
+    while position < len(query):
+        match = _TOKEN_PATTERN.match(query, position)
+        if not match:
+            raise InvalidTagQueryError(message=f"Unexpected character in: {query}")
+        quoted, word = match.groups()
+        if quoted is not None:
+            tokens.append(TagToken(TAG, quoted))
+        elif word.upper() in _OPERATORS:
+            tokens.append(TagToken(word.upper(), word))
+        elif word in ("(", ")"):
+            tokens.append(TagToken(word, word))
+        else:
+            tokens.append(TagToken(TAG, word))
+        position = match.end()
+    return tokens
+
+
+def query_terms(tokens: List[TagToken]) -> Set[str]:
+    return {token.value for token in tokens if token.kind == TAG}
+
+
+def evaluate_tag_query(
+    tokens: List[TagToken], resolve: Callable[[str], int], universe: int
+) -> int:
+    """
+    Evaluate a tag query over bitmaps of story ids.
+
+    Grammar, NOT binds tighter than AND, AND tighter than OR:
+        expression := term (OR term)*
+        term := factor (AND factor)*
+        factor := NOT factor | ( expression ) | tag
+
+    :param tokens: Tokens returned by tokenize_tag_query.
+    :param resolve: Returns the bitmap of stories with the tag.
+    :param universe: Bitmap of all stories, NOT is its difference.
+    :raises InvalidTagQueryError: On a malformed query or nesting deeper than
+        MAX_TAG_QUERY_DEPTH.
+    """
+    position = 0
+
+    def peek():
+        return tokens[position].kind if position < len(tokens) else None
+
+    def take():
+        nonlocal position
+        if position >= len(tokens):
+            raise InvalidTagQueryError(message="Unexpected end of the tag query")
+        position += 1
+        return tokens[position - 1]
+
+    def expression(depth: int) -> int:
+        bitmap = term(depth)
+        while peek() == "OR":
+            take()
+            bitmap |= term(depth)
+        return bitmap
+
+    def term(depth: int) -> int:
+        bitmap = factor(depth)
+        while peek() == "AND":
+            take()
+            bitmap &= factor(depth)
+        return bitmap
+
+    def factor(depth: int) -> int:
+        if depth > MAX_TAG_QUERY_DEPTH:
+            raise InvalidTagQueryError(
+                message=f"Tag query nested deeper than {MAX_TAG_QUERY_DEPTH} levels"
+            )
+        token = take()
+        if token.kind == "NOT":
+            return universe & ~factor(depth + 1)
+        if token.kind == "(":
+            bitmap = expression(depth + 1)
+            if take().kind != ")":
+                raise InvalidTagQueryError(message="Missing closing parenthesis")
+            return bitmap
+        if token.kind != TAG:
+            raise InvalidTagQueryError(
+                message=f"Unexpected {token.value} in the tag query"
+            )
+        return resolve(token.value)
+
+    bitmap = expression(0)
+    if position != len(tokens):
+        raise InvalidTagQueryError(
+            message=f"Unexpected {tokens[position].value} in the tag query"
+        )
+    return bitmap
@@ -0,0 +1,138 @@
+import asyncio
+import contextvars
+import logging
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.db.query_stats import QueryStats, get_query_stats, use_query_stats
+
+logger = logging.getLogger(__name__)
+
+WriteWork = Callable[[AsyncSession], Awaitable[Any]]
+WriteJob = Tuple[WriteWork, asyncio.Future, Optional[QueryStats]]
+
+
+class WriteExecutor:
+    """
+    Serializes database mutations in a single writer task and group-commits them.
+
+    Every submitted work is an async function receiving the writer session. Works queued
+    while the previous batch was committing are executed together and written with one
+    commit. A failing work doesn't affect the others, its error is raised to its caller
+    and the rest of the batch is executed again without it.
+    """
+
+    def __init__(
+        self,
+        session_maker: async_sessionmaker,
+        max_batch_size: int = 64,
+        batch_window: float = 0.0,
+    ):
+        """
+        :param session_maker: Session factory bound to the writer engine.
+        :param max_batch_size: Maximum number of works committed in one transaction.
+        :param batch_window: Seconds to wait for more works after the first one arrives.
+        """
+        self.session_maker = session_maker
+        self.max_batch_size = max_batch_size
+        self.batch_window = batch_window
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _ensure_worker(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = None
+        if self._worker is None or self._worker.done():
+            # The worker serves many requests, it mustn't inherit context variables
+            # of the request which happened to start it
+            self._worker = contextvars.Context().run(loop.create_task, self._run())
+
+    async def submit(self, work: WriteWork) -> Any:
+        """Queue the work for the writer task and wait for its result or error."""
+        self._ensure_worker()
+        future = self._loop.create_future()
+        # Zapytania wykonane przez zadanie zapisujące liczą się do żądania wywołującego
+        await self._queue.put((work, future, get_query_stats()))
+        return await future
+
+    async def stop(self):
+        """Finish queued works and stop the writer task."""
+        if self._worker is None or self._loop is not asyncio.get_running_loop():
+            return
+        await self._queue.join()
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            try:
+                if self.batch_window:
+                    await asyncio.sleep(self.batch_window)
+                while len(batch) < self.max_batch_size and not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                await self._commit_batch(batch)
+            except BaseException as error:
+                # Callers of the batch mustn't wait forever for a result
+                self._set_exception(batch, error)
+                stopping = asyncio.current_task().cancelling()
+                if stopping or not isinstance(
+                    error, (Exception, asyncio.CancelledError)
+                ):
+                    raise
+                # The writer keeps serving the next batches
+                logger.exception("Write batch failed")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _commit_batch(self, batch: List[WriteJob]):
+        pending = [job for job in batch if not job[1].cancelled()]
+        while pending:
+            results = []
+            failed_job = None
+            async with self.session_maker() as session:
+                try:
+                    for job in pending:
+                        failed_job = job
+                        work, _, stats = job
+                        with use_query_stats(stats):
+                            results.append(await work(session))
+                            # Flush after every work, so errors are assigned to the
+                            # right caller
+                            await session.flush()
+                    failed_job = None
+                    await session.commit()
+                except Exception as error:
+                    await session.rollback()
+                    if failed_job is None:
+                        # The commit itself failed, none of the works was written
+                        self._set_exception(pending, error)
+                        return
+                    self._set_exception([failed_job], error)
+                    pending.remove(failed_job)
+                    continue
+
+            for (_, future, _), result in zip(pending, results):
+                if not future.done():
+                    future.set_result(result)
+            return
+
+    @staticmethod
+    def _set_exception(jobs: List[WriteJob], error: BaseException):
+        for _, future, _ in jobs:
+            if future.done():
+                continue
+            if isinstance(error, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(error)
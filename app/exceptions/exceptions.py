@@ -47,3 +47,15 @@ class EmptyPasswordFormError(EscapeRoomError):
     """Not enough gold for purchase the story"""
 
     pass
+
+
+class InvalidCursorError(EscapeRoomError):
+    """Pagination cursor can't be decoded"""
+
+    pass
+
+
+class InvalidTagQueryError(EscapeRoomError):
+    """Tag query can't be parsed"""
+
+    pass
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db.storymanager import StoryManager, get_story_manager
@@ -10,6 +10,13 @@ from app.schemas.attempt import (
 )
 
 from app.db import db_attempt
+from app.routers.http_cache import (
+    etag_matches,
+    make_etag,
+    cache_headers,
+    not_modified,
+    json_response,
+)
 from app.db.models import User
 
 from app.users.manager import current_active_user
@@ -22,7 +29,7 @@ async def get_attempt(
     attempt_id: int,
     story_manager: StoryManager = Depends(get_story_manager),
 ):
-    await story_manager.load_by_attempt_id(attempt_id)
+    await story_manager.load_by_attempt_id(attempt_id, read_only=True)
 
     attempt = await story_manager.get_attempt()
     return attempt
@@ -33,17 +40,65 @@ async def get_hints(
     attempt_id: int,
     story_manager: StoryManager = Depends(get_story_manager),
 ):
-    await story_manager.load_by_attempt_id(attempt_id)
+    await story_manager.load_by_attempt_id(attempt_id, read_only=True)
     hints_list = await story_manager.get_hints()
     return hints_list
 
 
+@router.get("/{attempt_id}", response_model=AttemptDisplay)
+async def get_attempt_cacheable(
+    attempt_id: int,
+    request: Request,
+    story_manager: StoryManager = Depends(get_story_manager),
+):
+    await story_manager.load_by_attempt_id(attempt_id, read_only=True)
+    current_attempt = story_manager.current_attempt
+    stage = story_manager.stage
+    # Tylko pola widoczne w odpowiedzi, hasło etapu nie może trafić do ETagu
+    etag = make_etag(
+        "attempt",
+        attempt_id,
+        current_attempt.id,
+        current_attempt.start_date,
+        current_attempt.finish_date,
+        stage.id,
+        stage.level,
+        stage.name,
+        stage.question,
+    )
+    headers = cache_headers(etag)
+    if etag_matches(request, etag):
+        return not_modified(headers)
+
+    attempt = await story_manager.get_attempt()
+    return json_response(attempt, headers)
+
+
+@router.get("/{attempt_id}/hints", response_model=HintsDisplay)
+async def get_hints_cacheable(
+    attempt_id: int,
+    request: Request,
+    story_manager: StoryManager = Depends(get_story_manager),
+):
+    await story_manager.load_by_attempt_id(attempt_id, read_only=True)
+    # Liczba wskazówek i data ostatniej pozwalają odpowiedzieć 304 bez ich wczytania
+    hints_count, last_enter_date = await story_manager.get_hints_summary()
+    current_attempt = story_manager.current_attempt
+    etag = make_etag("hints", current_attempt.id, hints_count, last_enter_date)
+    headers = cache_headers(etag)
+    if etag_matches(request, etag):
+        return not_modified(headers)
+
+    hints_list = await story_manager.get_hints()
+    return json_response(hints_list, headers)
+
+
 @router.post("/{attempt_id}/check_password", response_model=PasswordCheckDisplay)
 async def password_validation(
     request: PasswordFormBase,
     attempt_id: int,
     story_manager: StoryManager = Depends(get_story_manager),
 ):
-    await story_manager.load_by_attempt_id(attempt_id)
+    await story_manager.load_by_attempt_id(attempt_id, read_only=True)
     check_password = await story_manager.validate_password(request.password)
     return check_password
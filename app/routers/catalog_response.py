@@ -0,0 +1,76 @@
+import gzip
+from typing import List, NamedTuple, Optional, Tuple
+
+from pydantic import TypeAdapter
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.catalog import catalog, CatalogSnapshot
+from app.routers.http_cache import make_etag
+from app.schemas.story import StoryBase
+
+_stories_adapter = TypeAdapter(List[StoryBase])
+_OWNED = b',"owned":true}'
+_NOT_OWNED = b',"owned":false}'
+
+
+class CatalogResponse(NamedTuple):
+    """JSON of the story list with its compressed variants, built once per catalog version."""
+
+    version: int
+    etag: str
+    body: bytes
+    encoded: dict
+    story_ids: Tuple[int, ...]
+    # JSON każdej historii bez zamykającego nawiasu, do doklejenia pól użytkownika
+    story_fragments: Tuple[bytes, ...]
+
+    def get_body(self, encoding: Optional[str]) -> bytes:
+        return self.encoded[encoding] if encoding else self.body
+
+    def get_etag(self, encoding: Optional[str]) -> str:
+        """Strong ETag of the body sent with the given content coding."""
+        # Każde kodowanie to inne bajty, więc musi mieć inny silny ETag
+        return f'{self.etag[:-1]}-{encoding}"' if encoding else self.etag
+
+    def get_owned_body(self, owned: int) -> bytes:
+        """Story list with the owned flag of every story taken from the bitset."""
+        return (
+            b"["
+            + b",".join(
+                fragment + (_OWNED if owned >> story_id & 1 else _NOT_OWNED)
+                for story_id, fragment in zip(self.story_ids, self.story_fragments)
+            )
+            + b"]"
+        )
+
+
+def build_catalog_response(snapshot: CatalogSnapshot) -> CatalogResponse:
+    stories = [StoryBase.model_validate(story._asdict()) for story in snapshot.stories]
+    body = _stories_adapter.dump_json(stories)
+    # Wysyłany jest tylko gzip, obsługiwany przez wszystkich klientów bez dodatkowych
+    # zależności
+    encoded = {"gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+    return CatalogResponse(
+        version=snapshot.version,
+        etag=make_etag(body),
+        body=body,
+        encoded=encoded,
+        story_ids=tuple(story.id for story in stories),
+        story_fragments=tuple(
+            story.model_dump_json()[:-1].encode() for story in stories
+        ),
+    )
+
+
+_catalog_response: Optional[CatalogResponse] = None
+
+
+async def get_catalog_response(db: AsyncSession) -> CatalogResponse:
+    """Return the prebuilt response, rebuilding it only when the catalog changed."""
+    global _catalog_response
+    snapshot = await catalog.get_snapshot(db)
+    catalog_response = _catalog_response
+    if catalog_response is None or catalog_response.version != snapshot.version:
+        catalog_response = build_catalog_response(snapshot)
+        _catalog_response = catalog_response
+    return catalog_response
@@ -0,0 +1,71 @@
+import hashlib
+from typing import Dict, Iterable, Optional
+
+from pydantic import BaseModel
+from starlette.requests import Request
+from starlette.responses import Response
+
+# Odpowiedzi zależne od użytkownika mogą być trzymane tylko przez przeglądarkę
+# i zawsze są rewalidowane
+PRIVATE_CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts) -> str:
+    """Strong ETag from the hash of the given parts."""
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode())
+        digest.update(b"\0")
+    return f'"{digest.hexdigest()[:32]}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Check the If-None-Match header with the weak comparison used for GET requests."""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag.removeprefix("W/"):
+            return True
+    return False
+
+
+def choose_encoding(request: Request, available: Iterable[str]) -> Optional[str]:
+    """Return the first available content coding accepted by the client."""
+    accepted = {}
+    for item in request.headers.get("accept-encoding", "").split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if coding:
+            accepted[coding.lower()] = quality
+    for coding in available:
+        if accepted.get(coding, accepted.get("*", 0.0)) > 0:
+            return coding
+    return None
+
+
+def not_modified(headers: dict) -> Response:
+    return Response(status_code=304, headers=headers)
+
+
+# Bez Last-Modified: daty w bazie mają sekundową dokładność i nie zmieniają się przy
+# każdej zmianie odpowiedzi, tylko ETag pozwala bezpiecznie odpowiedzieć 304
+def cache_headers(
+    etag: str, cache_control: str = PRIVATE_CACHE_CONTROL
+) -> Dict[str, str]:
+    return {"ETag": etag, "Cache-Control": cache_control}
+
+
+def json_response(model: BaseModel, headers: Dict[str, str]) -> Response:
+    return Response(
+        content=model.model_dump_json(),
+        media_type="application/json",
+        headers=headers,
+    )
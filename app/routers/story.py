@@ -1,23 +1,168 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query, Request, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import Dict, List, Optional
 
-from app.db.database import get_async_session
-from app.schemas.story import StoryDisplay, StoryBase
-from app.schemas.access import StoryStatus
+from app.db.database import get_async_session, get_async_read_session
+from app.schemas.story import (
+    StoryDisplay,
+    StoryBase,
+    StoryOwnedBase,
+    StoryPage,
+    StoryFacets,
+    StorySortEnum,
+    StorySearchResult,
+    StorySearchPage,
+)
+from app.schemas.access import StoryStatus, StoryStatusRequest
 from app.db import db_story
+from app.db.catalog import catalog
+from app.db.search import search_stories
+from app.db.autocomplete import title_index, MAX_SUGGESTIONS
+from app.routers.catalog_response import get_catalog_response
+from app.routers.http_cache import (
+    etag_matches,
+    choose_encoding,
+    not_modified,
+    make_etag,
+    cache_headers,
+    json_response,
+)
 from app.db.models import User
 from app.db.storymanager import get_story_manager, StoryManager
 
-from app.users.manager import current_active_user
+from app.users.manager import current_active_user, optional_active_user
+from app.db.status_cache import StoryStatusCache, get_status_cache
+from app.db.db_access import get_owned_story_ids
 
 router = APIRouter(prefix="/story", tags=["story"])
 
 
 @router.get("/", response_model=List[StoryBase])
-async def get_all_stories(db: AsyncSession = Depends(get_async_session)):
-    stories = await db_story.get_all_stories(db)
-    return stories
+async def get_all_stories(
+    request: Request, db: AsyncSession = Depends(get_async_read_session)
+):
+    # Odpowiedź jest gotowym JSON-em, przebudowywanym tylko po zmianie katalogu
+    catalog_response = await get_catalog_response(db)
+    encoding = choose_encoding(request, catalog_response.encoded)
+    etag = catalog_response.get_etag(encoding)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "public, no-cache",
+        "Vary": "Accept-Encoding",
+    }
+    if etag_matches(request, etag):
+        return not_modified(headers)
+
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(
+        content=catalog_response.get_body(encoding),
+        media_type="application/json",
+        headers=headers,
+    )
+
+
+@router.get("/page/", response_model=StoryPage)
+async def get_story_page(
+    type: Optional[str] = None,
+    difficulty: Optional[str] = None,
+    min_cost: Optional[int] = Query(None, ge=0),
+    max_cost: Optional[int] = Query(None, ge=0),
+    sort: StorySortEnum = StorySortEnum.create_date,
+    descending: bool = False,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_async_read_session),
+):
+    filters = db_story.StoryFilters(
+        type=type, difficulty=difficulty, min_cost=min_cost, max_cost=max_cost
+    )
+    stories, next_cursor = await db_story.get_story_page(
+        db, filters, sort=sort, descending=descending, cursor=cursor, limit=limit
+    )
+    facets = await db_story.get_story_facets(db, filters)
+    return StoryPage(
+        items=[
+            StoryBase.model_validate(story, from_attributes=True) for story in stories
+        ],
+        next_cursor=next_cursor,
+        facets=StoryFacets(**facets),
+    )
+
+
+@router.get("/tags/", response_model=List[StoryBase])
+async def query_stories_by_tags(
+    q: str,
+    db: AsyncSession = Depends(get_async_read_session),
+    status_cache: StoryStatusCache = Depends(get_status_cache),
+    user: Optional[User] = Depends(optional_active_user),
+):
+    load_owned = None
+    if user:
+
+        async def load_owned() -> int:
+            return await status_cache.get_owned_stories(
+                user.id, lambda: get_owned_story_ids(db, user)
+            )
+
+    return await db_story.get_stories_by_tags(db, q, load_owned)
+
+
+@router.get("/search/", response_model=StorySearchPage)
+async def search_stories_by_text(
+    q: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=50),
+    db: AsyncSession = Depends(get_async_read_session),
+):
+    # Pobierany jest jeden wynik więcej, żeby wiedzieć czy istnieje następna strona
+    hits = await search_stories(db, q, offset=offset, limit=limit + 1)
+    snapshot = await catalog.get_snapshot(db)
+    items = []
+    for hit in hits[:limit]:
+        story = snapshot.get_story(hit.story_id)
+        if story is None:
+            continue
+        items.append(
+            StorySearchResult(
+                **story._asdict(),
+                rank=hit.rank,
+                title_snippet=hit.title_snippet,
+                description_snippet=hit.description_snippet,
+            )
+        )
+    next_offset = offset + limit if len(hits) > limit else None
+    return StorySearchPage(items=items, next_offset=next_offset)
+
+
+@router.get("/autocomplete/", response_model=List[StoryBase])
+async def autocomplete_story_titles(
+    q: str,
+    limit: int = Query(MAX_SUGGESTIONS, ge=1, le=MAX_SUGGESTIONS),
+    db: AsyncSession = Depends(get_async_read_session),
+):
+    trie = await title_index.get_trie(db)
+    return [story._asdict() for story in trie.suggest(q, limit)]
+
+
+@router.get("/owned/", response_model=List[StoryOwnedBase])
+async def get_all_stories_with_ownership(
+    request: Request,
+    story_manager: StoryManager = Depends(get_story_manager),
+):
+    # Wspólny katalog jest łączony z bitsetem posiadanych historii użytkownika
+    catalog_response = await get_catalog_response(story_manager.read_db)
+    owned = await story_manager.get_owned_stories()
+    etag = make_etag("owned", catalog_response.etag, owned)
+    headers = cache_headers(etag)
+    if etag_matches(request, etag):
+        return not_modified(headers)
+
+    return Response(
+        content=catalog_response.get_owned_body(owned),
+        media_type="application/json",
+        headers=headers,
+    )
 
 
 @router.post("/new/", response_model=StoryDisplay)
@@ -28,13 +173,22 @@ async def create_story(
     return story
 
 
+@router.post("/access/", response_model=Dict[int, StoryStatus])
+async def check_access_many(
+    request: StoryStatusRequest,
+    story_manager: StoryManager = Depends(get_story_manager),
+):
+    # Jedno żądanie zastępuje osobne sprawdzenie dostępu dla każdej karty katalogu
+    return await story_manager.get_story_statuses(request.story_ids)
+
+
 @router.post("/{story_id}", response_model=StoryBase)
 async def get_story(
     story_id: int,
     story_manager: StoryManager = Depends(get_story_manager),
     user: User = Depends(current_active_user),
 ):
-    await story_manager.load_by_story_id(story_id=story_id)
+    await story_manager.load_by_story_id(story_id=story_id, read_only=True)
     return await story_manager.get_story()
 
 
@@ -42,7 +196,7 @@ async def get_story(
 async def get_story(
     story_id: int, story_manager: StoryManager = Depends(get_story_manager)
 ):
-    await story_manager.load_by_story_id(story_id)
+    await story_manager.load_by_story_id(story_id, read_only=True)
     await story_manager.buy_story()
     response = await story_manager.check_access()
     return response
@@ -52,7 +206,7 @@ async def get_story(
 async def get_story(
     story_id: int, story_manager: StoryManager = Depends(get_story_manager)
 ):
-    await story_manager.load_by_story_id(story_id)
+    await story_manager.load_by_story_id(story_id, read_only=True)
     await story_manager.start_story()
     response = await story_manager.check_access()
     return response
@@ -62,6 +216,37 @@ async def get_story(
 async def check_access(
     story_id: int, story_manager: StoryManager = Depends(get_story_manager)
 ):
-    await story_manager.load_by_story_id(story_id)
-    response = await story_manager.check_access()
+    response = await story_manager.get_story_status(story_id)
     return response
+
+
+@router.get("/{story_id}", response_model=StoryBase)
+async def get_story_cacheable(
+    story_id: int,
+    request: Request,
+    story_manager: StoryManager = Depends(get_story_manager),
+):
+    await story_manager.load_story(story_id)
+    story = await story_manager.get_story()
+    etag = make_etag("story", story)
+    headers = cache_headers(etag)
+    if etag_matches(request, etag):
+        return not_modified(headers)
+
+    return json_response(StoryBase.model_validate(story._asdict()), headers)
+
+
+@router.get("/{story_id}/access/", response_model=StoryStatus)
+async def check_access_cacheable(
+    story_id: int,
+    request: Request,
+    story_manager: StoryManager = Depends(get_story_manager),
+):
+    # Status zwykle pochodzi z cache w Redis, bez zapytań do bazy
+    story_status = await story_manager.get_story_status(story_id)
+    etag = make_etag("access", story_id, story_status.model_dump_json())
+    headers = cache_headers(etag)
+    if etag_matches(request, etag):
+        return not_modified(headers)
+
+    return json_response(story_status, headers)
@@ -1,6 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 from enum import Enum
 from uuid import UUID
 
@@ -35,3 +35,7 @@ class StoryAccessBase(BaseModel):
 class StoryStatus(BaseModel):
     status: StatusEnum
     story_access: Optional[StoryAccessBase]
+
+
+class StoryStatusRequest(BaseModel):
+    story_ids: List[int] = Field(min_length=1, max_length=100)
@@ -1,6 +1,7 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Dict, List, Optional
 from datetime import datetime
+from enum import Enum
 
 
 class StoryDisplay(BaseModel):
@@ -15,3 +16,35 @@ class StoryDisplay(BaseModel):
 class StoryBase(StoryDisplay):
     id: int
     create_date: Optional[datetime] = None
+
+
+class StoryOwnedBase(StoryBase):
+    owned: bool
+
+
+class StorySortEnum(str, Enum):
+    rating = "rating"
+    cost = "cost"
+    create_date = "create_date"
+
+
+class StoryFacets(BaseModel):
+    type: Dict[str, int]
+    difficulty: Dict[str, int]
+
+
+class StoryPage(BaseModel):
+    items: List[StoryBase]
+    next_cursor: Optional[str]
+    facets: StoryFacets
+
+
+class StorySearchResult(StoryBase):
+    rank: float
+    title_snippet: str
+    description_snippet: str
+
+
+class StorySearchPage(BaseModel):
+    items: List[StorySearchResult]
+    next_offset: Optional[int]
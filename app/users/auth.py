@@ -1,3 +1,6 @@
+from typing import Optional
+
+from fastapi_users import BaseUserManager, exceptions
 from fastapi_users.authentication import (
     AuthenticationBackend,
     BearerTransport,
@@ -5,14 +8,59 @@ from fastapi_users.authentication import (
 )
 import redis.asyncio
 
+from app.db.models import User
+from app.users.user_cache import UserCache
+
 REDIS_URL = "redis://localhost:6379"
 bearer_transport = BearerTransport(tokenUrl="auth/redis/login")
 
 redis = redis.asyncio.from_url(REDIS_URL, decode_responses=True)
+user_cache = UserCache(redis)
+
+
+class CachedRedisStrategy(RedisStrategy):
+    """RedisStrategy which keeps users of recently read tokens in a UserCache."""
+
+    def __init__(self, redis, lifetime_seconds: Optional[int], user_cache: UserCache):
+        super().__init__(redis, lifetime_seconds)
+        self.user_cache = user_cache
+
+    async def read_token(
+        self, token: Optional[str], user_manager: BaseUserManager
+    ) -> Optional[User]:
+        if token is None:
+            return None
+        user = self.user_cache.get(token)
+        if user is not None:
+            return user
+
+        generation = self.user_cache.generation
+        key = f"{self.key_prefix}{token}"
+        # Pozostały czas życia tokenu ogranicza czas trzymania użytkownika w cache
+        async with self.redis.pipeline(transaction=False) as pipe:
+            user_id, token_ttl_ms = await pipe.get(key).pttl(key).execute()
+        if user_id is None:
+            return None
+        try:
+            user = await user_manager.get(user_manager.parse_id(user_id))
+        except (exceptions.UserNotExists, exceptions.InvalidID):
+            return None
+
+        token_ttl = token_ttl_ms / 1000 if token_ttl_ms >= 0 else None
+        self.user_cache.set(token, user, generation, token_ttl)
+        return user
+
+    async def destroy_token(self, token: str, user: User) -> None:
+        await super().destroy_token(token, user)
+        await self.user_cache.invalidate_token(token, self.redis)
+
+
+def get_user_cache() -> UserCache:
+    return user_cache
 
 
 def get_redis_strategy() -> RedisStrategy:
-    return RedisStrategy(redis, lifetime_seconds=3600)
+    return CachedRedisStrategy(redis, lifetime_seconds=3600, user_cache=user_cache)
 
 
 auth_backend = AuthenticationBackend(
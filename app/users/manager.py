@@ -1,12 +1,13 @@
 import uuid
-from typing import Optional
+from typing import Any, Dict, Optional
 
 from fastapi import Depends, Request
 from fastapi_users import BaseUserManager, UUIDIDMixin, FastAPIUsers
 
 from app.db.database import get_user_db
 from app.db.models import User
-from app.users.auth import auth_backend
+from app.users.auth import auth_backend, get_user_cache
+from app.users.user_cache import UserCache
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi_users.exceptions import UserNotExists
 
@@ -17,9 +18,37 @@ class UserManager(UUIDIDMixin, BaseUserManager[User, uuid.UUID]):
     reset_password_token_secret = SECRET
     verification_token_secret = SECRET
 
+    def __init__(self, user_db, user_cache: Optional[UserCache] = None):
+        """
+        :param user_db: Database adapter of users.
+        :param user_cache: UserCache invalidated when a user changes.
+        """
+        super().__init__(user_db)
+        self.user_cache = user_cache
+
+    async def _invalidate_cached_user(self, user: User):
+        if self.user_cache:
+            await self.user_cache.invalidate_user(user.id)
+
     async def on_after_register(self, user: User, request: Optional[Request] = None):
         print(f"User {user.id} has registered.")
 
+    async def on_after_update(
+        self, user: User, update_dict: Dict[str, Any], request: Optional[Request] = None
+    ):
+        await self._invalidate_cached_user(user)
+
+    async def on_after_reset_password(
+        self, user: User, request: Optional[Request] = None
+    ):
+        await self._invalidate_cached_user(user)
+
+    async def on_after_verify(self, user: User, request: Optional[Request] = None):
+        await self._invalidate_cached_user(user)
+
+    async def on_after_delete(self, user: User, request: Optional[Request] = None):
+        await self._invalidate_cached_user(user)
+
     async def on_after_forgot_password(
         self, user: User, token: str, request: Optional[Request] = None
     ):
@@ -71,10 +100,14 @@ class UserManager(UUIDIDMixin, BaseUserManager[User, uuid.UUID]):
         return user
 
 
-async def get_user_manager(user_db=Depends(get_user_db)):
-    yield UserManager(user_db)
+async def get_user_manager(
+    user_db=Depends(get_user_db), user_cache: UserCache = Depends(get_user_cache)
+):
+    yield UserManager(user_db, user_cache)
 
 
 fastapi_users = FastAPIUsers[User, uuid.UUID](get_user_manager, [auth_backend])
 
 current_active_user = fastapi_users.current_user(active=True)
+optional_active_user = fastapi_users.current_user(active=True, optional=True)
+current_superuser = fastapi_users.current_user(active=True, superuser=True)
@@ -0,0 +1,168 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, NamedTuple, Optional, Set
+from uuid import UUID
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+
+from app.db.models import User
+
+logger = logging.getLogger(__name__)
+
+# Liczba tokenów trzymanych w pamięci procesu i czas ich ważności w sekundach
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "1024"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "30"))
+USER_CACHE_CHANNEL = "user_cache:invalidate"
+
+_USER_COLUMNS = tuple(attribute.key for attribute in inspect(User).column_attrs)
+
+
+class UserSnapshot(NamedTuple):
+    user_id: UUID
+    columns: Dict[str, Any]
+    expires_at: float
+
+
+class UserCache:
+    """
+    Process-local LRU mapping tokens to column values of their users.
+
+    Every hit returns a new detached User, so requests don't share ORM instances.
+    Logout and user updates invalidate the entries locally and publish the invalidation
+    on a Redis channel, listen() applies invalidations published by other workers.
+    """
+
+    def __init__(
+        self,
+        redis_client: Redis,
+        maxsize: int = USER_CACHE_SIZE,
+        ttl: float = USER_CACHE_TTL,
+        channel: str = USER_CACHE_CHANNEL,
+    ):
+        """
+        :param redis_client: Redis client created with decode_responses=True.
+        :param maxsize: Maximum number of cached tokens.
+        :param ttl: Seconds after which a cached user is loaded again.
+        :param channel: Redis pub/sub channel carrying invalidations between workers.
+        """
+        self.redis = redis_client
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.channel = channel
+        self.generation: int = 0
+        self._snapshots: "OrderedDict[str, UserSnapshot]" = OrderedDict()
+        self._tokens_by_user: Dict[UUID, Set[str]] = {}
+
+    def get(self, token: str) -> Optional[User]:
+        snapshot = self._snapshots.get(token)
+        if snapshot is None:
+            return None
+        if snapshot.expires_at <= time.monotonic():
+            self._remove(token)
+            return None
+        self._snapshots.move_to_end(token)
+
+        user = User(**snapshot.columns)
+        # Obiekt jest traktowany jak wczytany z bazy, aktualizacje wykonają UPDATE
+        make_transient_to_detached(user)
+        return user
+
+    def set(
+        self,
+        token: str,
+        user: User,
+        generation: int,
+        token_ttl: Optional[float] = None,
+    ):
+        """
+        Cache the user read for the token.
+
+        :param generation: Value of self.generation read before the user was loaded,
+            the user isn't cached when an invalidation happened in the meantime.
+        :param token_ttl: Seconds the token remains valid, the entry never outlives it.
+        """
+        if generation != self.generation:
+            return
+        ttl = self.ttl if token_ttl is None else min(self.ttl, token_ttl)
+        if ttl <= 0:
+            return
+        self._remove(token)
+        self._snapshots[token] = UserSnapshot(
+            user_id=user.id,
+            columns={column: getattr(user, column) for column in _USER_COLUMNS},
+            expires_at=time.monotonic() + ttl,
+        )
+        self._tokens_by_user.setdefault(user.id, set()).add(token)
+        while len(self._snapshots) > self.maxsize:
+            self._remove(next(iter(self._snapshots)))
+
+    async def invalidate_token(self, token: str, redis_client: Optional[Redis] = None):
+        """
+        :param redis_client: Client used to publish the invalidation, defaults to the
+            client of the cache.
+        """
+        self._drop_token(token)
+        await self._publish(f"token:{token}", redis_client)
+
+    async def invalidate_user(self, user_id: UUID):
+        self._drop_user(user_id)
+        await self._publish(f"user:{user_id}")
+
+    async def listen(self):
+        """Apply invalidations published by other workers until cancelled."""
+        while True:
+            try:
+                async with self.redis.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self.apply(message["data"])
+            except Exception:
+                # Bez kanału nie wiadomo co zostało unieważnione, wpisy są usuwane,
+                # a subskrypcja jest odnawiana
+                logger.exception("User cache invalidation channel failed")
+                self.clear()
+                await asyncio.sleep(1)
+
+    def apply(self, message: str):
+        kind, _, value = message.partition(":")
+        if kind == "token":
+            self._drop_token(value)
+        elif kind == "user":
+            self._drop_user(UUID(value))
+
+    def clear(self):
+        self.generation += 1
+        self._snapshots.clear()
+        self._tokens_by_user.clear()
+
+    async def _publish(self, message: str, redis_client: Optional[Redis] = None):
+        try:
+            await (redis_client or self.redis).publish(self.channel, message)
+        except RedisError as error:
+            logger.warning("User cache invalidation publish failed: %s", error)
+
+    def _drop_token(self, token: str):
+        self.generation += 1
+        self._remove(token)
+
+    def _remove(self, token: str):
+        snapshot = self._snapshots.pop(token, None)
+        if snapshot is None:
+            return
+        tokens = self._tokens_by_user.get(snapshot.user_id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_user[snapshot.user_id]
+
+    def _drop_user(self, user_id: UUID):
+        self.generation += 1
+        for token in self._tokens_by_user.pop(user_id, set()):
+            self._snapshots.pop(token, None)
@@ -1,3 +1,5 @@
+import asyncio
+
 from fastapi import Depends, FastAPI, status
 from starlette.requests import Request
 from starlette.responses import JSONResponse
@@ -8,10 +10,19 @@ from app.routers import attempt
 from typing import Callable, Any, Coroutine
 
 from app.db.models import User
-from app.db.database import create_db_and_tables, get_async_session
+from app.db.database import (
+    create_db_and_tables,
+    get_async_session,
+    get_sqlite_profile_status,
+    engine,
+    write_executor,
+)
 from app.users.schemas import UserCreate, UserRead, UserUpdate
-from app.users.manager import current_active_user, fastapi_users
-from app.users.auth import auth_backend
+from app.users.manager import current_active_user, current_superuser, fastapi_users
+from app.users.auth import auth_backend, user_cache, redis
+from app.db.catalog import catalog
+from app.db import query_stats
+from app.db.query_stats import start_query_stats, check_query_budget
 from populate_data import populate_data
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -26,6 +37,8 @@ from app.exceptions.exceptions import (
     StoryAlreadyStartedError,
     UnAuthenticatedUserError,
     EmptyPasswordFormError,
+    InvalidCursorError,
+    InvalidTagQueryError,
 )
 
 
@@ -33,12 +46,30 @@ from app.exceptions.exceptions import (
 async def lifespan(app: FastAPI):
     # Startup: Database setup
     await create_db_and_tables()
+    # Unieważnienia cache użytkowników z innych workerów
+    user_cache_listener = asyncio.create_task(user_cache.listen())
+    # Unieważnienia katalogu historii z innych workerów
+    catalog_listener = asyncio.create_task(catalog.listen(redis))
     yield
-    # Shutdown: Any necessary cleanup (if required)
+    # Shutdown: Write pending mutations
+    user_cache_listener.cancel()
+    catalog_listener.cancel()
+    await write_executor.stop()
 
 
 app = FastAPI(lifespan=lifespan)
 
+
+@app.middleware("http")
+async def query_stats_middleware(request: Request, call_next):
+    stats = start_query_stats()
+    response = await call_next(request)
+    check_query_budget(stats, f"{request.method} {request.url.path}")
+    if query_stats.QUERY_STATS_HEADERS:
+        response.headers.update(stats.as_headers())
+    return response
+
+
 app.include_router(story.router)
 app.include_router(attempt.router)
 
@@ -81,6 +112,11 @@ async def home_page():
     return {"message": "hello world"}
 
 
+@app.get("/db-profile", dependencies=[Depends(current_superuser)])
+async def database_profile():
+    return await get_sqlite_profile_status(engine)
+
+
 @app.get("/load-data")
 async def home_page(db: AsyncSession = Depends(get_async_session)):
     var = await populate_data(db)
@@ -146,6 +182,16 @@ app.add_exception_handler(
         status.HTTP_422_UNPROCESSABLE_ENTITY, "Invalid passwrod for attempt"
     ),
 )
+app.add_exception_handler(
+    exc_class_or_status_code=InvalidCursorError,
+    handler=create_exception_handler(
+        status.HTTP_400_BAD_REQUEST, "Invalid pagination cursor"
+    ),
+)
+app.add_exception_handler(
+    exc_class_or_status_code=InvalidTagQueryError,
+    handler=create_exception_handler(status.HTTP_400_BAD_REQUEST, "Invalid tag query"),
+)
 origins = [
     "http://localhost:3000",
 ]
@@ -2,32 +2,32 @@ from app.db.models import User, Story, Stage, Hint
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from random import randint
-
-
-async def create_random_hint(db: AsyncSession, stage: Stage, number: int):
-    hint = Hint(
-        text=f"podpowiedź numer {number}",
-        trigger=f"Wyzwalacz podpowiedzi {number}",
-        stage_id=stage.id,
-    )
-
-    db.add(hint)
-    await db.commit()
-
-
-async def create_random_stage(db: AsyncSession, story: Story, level: int):
-    stage = Stage(
-        name=f"poziom {level} do {story.title}",
-        level=level,
-        question="opis zadania",
-        password="odpowiedź która powinna być przekazana przez uzytkownika",
-        story_id=story.id,
-    )
-    db.add(stage)
-    await db.commit()
-
-    for i in range(1, 4):
-        await create_random_hint(db, stage, i)
+from app.db.db_queries import create_instances
+from app.db.catalog import catalog
+
+
+def random_hint_rows(stage_id: int):
+    return [
+        {
+            "text": f"podpowiedź numer {number}",
+            "trigger": f"Wyzwalacz podpowiedzi {number}",
+            "stage_id": stage_id,
+        }
+        for number in range(1, 4)
+    ]
+
+
+def random_stage_rows(story: Story):
+    return [
+        {
+            "name": f"poziom {level} do {story.title}",
+            "level": level,
+            "question": "opis zadania",
+            "password": "odpowiedź która powinna być przekazana przez uzytkownika",
+            "story_id": story.id,
+        }
+        for level in range(1, 6)
+    ]
 
 
 async def create_random_story(db: AsyncSession):
@@ -42,10 +42,16 @@ async def create_random_story(db: AsyncSession):
         cost=randint(0, 50),
     )
     db.add(story)
-    await db.commit()
+    await db.flush()
 
-    for i in range(1, 6):
-        await create_random_stage(db, story, i)
+    # Poziomy i podpowiedzi są zapisywane wielowierszowymi INSERT w jednej transakcji
+    stage_ids = await create_instances(
+        db, Stage, random_stage_rows(story), commit=False, primary_keys_only=True
+    )
+    hint_rows = [row for stage_id in stage_ids for row in random_hint_rows(stage_id)]
+    await create_instances(db, Hint, hint_rows, commit=False, primary_keys_only=True)
+    await db.commit()
+    catalog.invalidate()
 
     return story
 
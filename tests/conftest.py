@@ -2,7 +2,17 @@ import pytest
 import json
 import pytest_asyncio
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from app.db.database import get_async_session
+from app.db.database import (
+    get_async_session,
+    get_async_read_session,
+    get_write_executor,
+)
+from app.db.writer import WriteExecutor
+from app.db.status_cache import StoryStatusCache, get_status_cache
+from app.db.catalog import catalog
+from app.db.id_filter import attempt_ids
+from app.db.query_cache import query_cache
+from app.db.query_stats import register_query_stats
 from app.db.models import *
 from app.users.manager import get_user_manager
 from pathlib import Path
@@ -11,7 +21,8 @@ import logging
 from httpx import ASGITransport, AsyncClient
 from main import app
 import redis.asyncio as aioredis
-from app.users.auth import get_redis_strategy, RedisStrategy
+from app.users.auth import get_redis_strategy, get_user_cache, RedisStrategy
+from app.users.user_cache import UserCache
 from app.db.extended_user_database import ExtendedSQLAlchemyUserDatabase
 from app.db.models import User
 from fastapi_users.password import PasswordHelper
@@ -19,11 +30,11 @@ from app.db.db_queries import get_instance
 from app.db.storymanager import StoryManager
 from tests.routers.test_login import login_and_get_token
 
-
 REDIS_URL = "redis://localhost:6379/1"
 DATABASE_URL = "sqlite+aiosqlite:///:memory:"
 # Tworzymy asynchroniczny silnik i konfigurujemy sesję
 engine = create_async_engine(DATABASE_URL, echo=False)
+register_query_stats(engine)
 AsyncSessionLocal = async_sessionmaker(bind=engine, expire_on_commit=False)
 
 
@@ -174,6 +185,24 @@ async def get_test_async_session() -> AsyncSession:
 @pytest_asyncio.fixture(scope="function", autouse=True)
 def override_get_async_session():
     app.dependency_overrides[get_async_session] = get_test_async_session
+    app.dependency_overrides[get_async_read_session] = get_test_async_session
+
+
+@pytest_asyncio.fixture(scope="function", autouse=True)
+def reset_catalog():
+    """Database is recreated for every test, the catalog snapshot has to follow it."""
+    catalog.invalidate()
+    attempt_ids.reset()
+    query_cache.clear()
+
+
+@pytest_asyncio.fixture(scope="function", autouse=True)
+async def override_get_write_executor():
+    """Write mutations of the application through an executor bound to the test database."""
+    test_write_executor = WriteExecutor(AsyncSessionLocal)
+    app.dependency_overrides[get_write_executor] = lambda: test_write_executor
+    yield test_write_executor
+    await test_write_executor.stop()
 
 
 @pytest_asyncio.fixture(scope="function")
@@ -186,6 +215,24 @@ async def test_redis():
     await redis.aclose()  # Properly close the Redis client
 
 
+@pytest.fixture(scope="function", autouse=True)
+def override_get_status_cache(test_redis):
+    """Keep story statuses in the test Redis, which is cleared for every test."""
+    test_status_cache = StoryStatusCache(test_redis)
+    app.dependency_overrides[get_status_cache] = lambda: test_status_cache
+    yield test_status_cache
+    app.dependency_overrides.pop(get_status_cache, None)
+
+
+@pytest.fixture(scope="function", autouse=True)
+def override_get_user_cache(test_redis):
+    """Publish user cache invalidations through the test Redis."""
+    test_user_cache = UserCache(test_redis)
+    app.dependency_overrides[get_user_cache] = lambda: test_user_cache
+    yield test_user_cache
+    app.dependency_overrides.pop(get_user_cache, None)
+
+
 @pytest.fixture(scope="function")
 def override_get_redis_strategy(test_redis):
     """
@@ -217,7 +264,7 @@ async def async_client(override_get_redis_strategy):
 
 
 @pytest_asyncio.fixture
-async def user_manager(session: AsyncSession):
+async def user_manager(session: AsyncSession, override_get_user_cache: UserCache):
     user_db = ExtendedSQLAlchemyUserDatabase(session, User)
     # Optionally prepopulate users
     password_helper = PasswordHelper()
@@ -236,7 +283,9 @@ async def user_manager(session: AsyncSession):
     session.add(test_user)
     await session.commit()
 
-    async for manager in get_user_manager(user_db=user_db):
+    async for manager in get_user_manager(
+        user_db=user_db, user_cache=override_get_user_cache
+    ):
         yield manager
 
 
@@ -0,0 +1,51 @@
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.autocomplete import TitleTrie, title_index
+from app.db.catalog import StoryEntry, catalog
+from app.db.db_story import create_story
+from app.db.query_stats import start_query_stats
+from app.schemas.story import StoryDisplay
+
+
+def entry(story_id: int, title: str, rating=None) -> StoryEntry:
+    return StoryEntry(story_id, title, "", "mystery", "Easy", rating, 0, None)
+
+
+def test_suggest_matches_word_prefixes_by_rating():
+    trie = TitleTrie(version=0, size=2)
+    for story in [
+        entry(1, "Zamek Łańcuchów", 3.0),
+        entry(2, "Złoty zamek", 5.0),
+        entry(3, "Zamek", None),
+        entry(4, "Las", 4.0),
+    ]:
+        trie.add(story)
+
+    assert [story.id for story in trie.suggest("zam")] == [2, 1]
+    assert [story.id for story in trie.suggest("ZAMEK  lan")] == [1]
+    assert [story.id for story in trie.suggest("zloty")] == [2]
+    assert [story.id for story in trie.suggest("z", limit=1)] == [2]
+    assert trie.suggest("zamki") == []
+    assert trie.suggest(" ") == []
+
+
+@pytest.mark.asyncio
+async def test_created_story_is_added_without_sql(session: AsyncSession):
+    trie = await title_index.get_trie(session)
+    story = await create_story(
+        session,
+        StoryDisplay(
+            title="Adventure in the castle",
+            description="",
+            type="adventure",
+            difficulty="Hard",
+            rating=1.0,
+            cost=10,
+        ),
+    )
+
+    stats = start_query_stats()
+    assert await title_index.get_trie(session) is trie
+    assert trie.version == catalog.version
+    assert story.id in [story.id for story in trie.suggest("adventure")]
+    assert stats.count == 0
@@ -0,0 +1,98 @@
+import asyncio
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.catalog import Catalog, StoryEntry, StageEntry
+from app.db.query_stats import start_query_stats
+
+
+@pytest.mark.asyncio
+async def test_snapshot_contains_stories_stages_and_hints(session: AsyncSession):
+    """The snapshot keeps stories by id, stages ordered by level and hints per stage."""
+    snapshot = await Catalog().get_snapshot(session)
+
+    story = snapshot.get_story(1)
+    assert isinstance(story, StoryEntry)
+    assert story.title == "Adventure Story"
+
+    levels = [stage.level for stage in snapshot.stages_by_story[1]]
+    assert levels == sorted(levels)
+
+    first_stage = snapshot.stages_by_story[2][0]
+    next_stage = snapshot.get_next_stage(first_stage)
+    assert isinstance(next_stage, StageEntry)
+    assert next_stage.name == "Second Challenge Indiana"
+    assert snapshot.get_next_stage(snapshot.stages_by_story[1][-1]) is None
+
+    assert "give me hint 3" in [hint.trigger for hint in snapshot.get_hints(2)]
+
+
+@pytest.mark.asyncio
+async def test_snapshot_is_reused_until_invalidated(session: AsyncSession):
+    """Reads of an unchanged catalog don't execute SQL, invalidation rebuilds it."""
+    catalog = Catalog()
+    snapshot = await catalog.get_snapshot(session)
+
+    stats = start_query_stats()
+    assert await catalog.get_snapshot(session) is snapshot
+    assert stats.count == 0
+
+    catalog.invalidate()
+    rebuilt = await catalog.get_snapshot(session)
+    assert rebuilt is not snapshot
+    assert rebuilt.version == snapshot.version + 1
+
+
+@pytest.mark.asyncio
+async def test_snapshot_is_immutable(session: AsyncSession):
+    """Entries and mappings of the snapshot can't be modified by readers."""
+    snapshot = await Catalog().get_snapshot(session)
+
+    with pytest.raises(TypeError):
+        snapshot.stories_by_id[1] = None
+    with pytest.raises(AttributeError):
+        snapshot.get_story(1).cost = 0
+
+
+@pytest.mark.asyncio
+async def test_invalidation_is_published_to_other_workers(
+    session: AsyncSession, test_redis
+):
+    """An invalidation on one worker makes the listening ones rebuild their snapshot."""
+    publisher, listener = Catalog(), Catalog()
+    tasks = [
+        asyncio.create_task(publisher.listen(test_redis)),
+        asyncio.create_task(listener.listen(test_redis)),
+    ]
+    # Czas na subskrypcję kanału
+    await asyncio.sleep(0.1)
+    snapshot = await listener.get_snapshot(session)
+    publisher_version = publisher.version
+
+    publisher.invalidate()
+    for _ in range(50):
+        if listener.version != snapshot.version:
+            break
+        await asyncio.sleep(0.01)
+    for task in tasks:
+        task.cancel()
+
+    assert (await listener.get_snapshot(session)) is not snapshot
+    assert publisher.version == publisher_version + 1, "Own messages are ignored."
+
+
+@pytest.mark.asyncio
+async def test_snapshot_expires_and_misses_reload_once(session: AsyncSession):
+    """Old snapshots are rebuilt, a miss reloads at most once per interval."""
+    catalog = Catalog(ttl=0.05, miss_reload_interval=0.05)
+    snapshot = await catalog.get_snapshot(session)
+
+    stats = start_query_stats()
+    assert await catalog.reload_on_miss(session) is snapshot
+    assert stats.count == 0
+
+    await asyncio.sleep(0.06)
+    assert await catalog.reload_on_miss(session) is not snapshot
+
+    snapshot = await catalog.get_snapshot(session)
+    await asyncio.sleep(0.06)
+    assert await catalog.get_snapshot(session) is not snapshot
@@ -4,6 +4,12 @@ from sqlalchemy.exc import OperationalError
 from app.db.models import User
 from app.db.extended_user_database import ExtendedSQLAlchemyUserDatabase
 from sqlalchemy.sql import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from app.db.database import (
+    create_missing_indexes,
+    register_sqlite_profile,
+    get_sqlite_profile_status,
+)
 from tests.conftest import engine
 
 
@@ -56,3 +62,95 @@ async def test_get_user_db(session: AsyncSession):
     """Test that get_user_db yields an ExtendedSQLAlchemyUserDatabase instance."""
     user_db = ExtendedSQLAlchemyUserDatabase(session, User)
     assert isinstance(user_db, ExtendedSQLAlchemyUserDatabase)
+
+
+@pytest.mark.asyncio
+async def test_create_missing_indexes(setup_database):
+    """Test that create_missing_indexes restores indexes missing in an existing database."""
+    async with engine.begin() as conn:
+        await conn.execute(text("DROP INDEX ix_password_attempt_attempt_id"))
+        await conn.run_sync(create_missing_indexes)
+
+        result = await conn.execute(
+            text("SELECT name FROM sqlite_master WHERE type='index'")
+        )
+        indexes = [row[0] for row in result]
+        expected_indexes = [
+            "ix_story_access_user_id_story_id",
+            "ix_attempt_story_access_id_id",
+            "ix_stage_story_id_level",
+            "ix_hint_stage_id_trigger",
+            "ix_hints_attempt_attempt_id_hint_id",
+            "ix_password_attempt_attempt_id",
+        ]
+        for index in expected_indexes:
+            assert index in indexes, f"Index {index} was not created."
+
+
+@pytest.mark.asyncio
+async def test_register_sqlite_profile(tmp_path):
+    """Test that the PRAGMA profile is applied to new connections and can be verified."""
+    profile_engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/profile.db")
+    register_sqlite_profile(profile_engine, "production")
+
+    status = await get_sqlite_profile_status(profile_engine, "production")
+    await profile_engine.dispose()
+
+    assert status["profile"] == "production"
+    assert status["pragmas"]["journal_mode"] == "wal"
+    assert status["pragmas"]["synchronous"] == 1  # NORMAL
+    assert status["pragmas"]["busy_timeout"] == 10000
+    assert status["pragmas"]["mmap_size"] == 268435456
+
+
+def test_register_unknown_sqlite_profile():
+    """Test that an unknown profile name is rejected."""
+    profile_engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    with pytest.raises(ValueError, match="Unknown database profile"):
+        register_sqlite_profile(profile_engine, "unknown")
+
+
+@pytest.mark.asyncio
+async def test_query_only_profile_rejects_writes(tmp_path):
+    """Test that connections of the reader engine can read but not write."""
+    database_url = f"sqlite+aiosqlite:///{tmp_path}/reader.db"
+    writer_engine = create_async_engine(database_url)
+    reader_engine = create_async_engine(database_url)
+    register_sqlite_profile(writer_engine, "development")
+    register_sqlite_profile(reader_engine, "development", query_only=True)
+
+    async with writer_engine.begin() as conn:
+        await conn.execute(text("CREATE TABLE item (id INTEGER PRIMARY KEY)"))
+        await conn.execute(text("INSERT INTO item (id) VALUES (1)"))
+
+    async with reader_engine.connect() as conn:
+        result = await conn.execute(text("SELECT count(*) FROM item"))
+        assert result.scalar() == 1
+        with pytest.raises(OperationalError):
+            await conn.execute(text("INSERT INTO item (id) VALUES (2)"))
+
+    await writer_engine.dispose()
+    await reader_engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_create_missing_indexes_skips_unique_index_with_duplicates(
+    setup_database, caplog
+):
+    """A unique index over duplicate rows is logged and skipped instead of failing."""
+    async with engine.begin() as conn:
+        await conn.execute(text("DROP INDEX ix_hints_attempt_attempt_id_hint_id"))
+        await conn.execute(
+            text(
+                "INSERT INTO hints_attempt (attempt_id, hint_id, enter_date) "
+                "SELECT attempt_id, hint_id, enter_date FROM hints_attempt LIMIT 1"
+            )
+        )
+        await conn.run_sync(create_missing_indexes)
+
+        result = await conn.execute(
+            text("SELECT name FROM sqlite_master WHERE type='index'")
+        )
+        assert "ix_hints_attempt_attempt_id_hint_id" not in [row[0] for row in result]
+        assert "ix_hints_attempt_attempt_id_hint_id not created" in caplog.text
+        await conn.rollback()
@@ -1,7 +1,11 @@
 import pytest
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.models import StoryAccess, User
-from app.db.db_access import get_story_access, get_story_access_by_attempt
+from app.db.db_access import (
+    get_story_access,
+    get_attempt_progress,
+    get_access_progress,
+)
 
 from app.exceptions.exceptions import EntityDoesNotExistError, UnAuthenticatedUserError
 
@@ -42,47 +46,60 @@ async def test_get_story_access_nonexistent(session: AsyncSession, mock_user: Us
 
 
 @pytest.mark.asyncio
-async def test_get_story_access_by_attempt(session: AsyncSession, mock_user: User):
-    # Pobierz przykładowego użytkownika i próbę z danych testowych
-    attempt_id = 1  # Zakładamy, że attempt_id 1 istnieje w test_data.json
-
-    # Wywołanie testowanej funkcji
-    story_access = await get_story_access_by_attempt(session, attempt_id, mock_user)
+async def test_get_attempt_progress_resolves_latest_attempt(
+    session: AsyncSession, mock_user: User
+):
+    # Próba 1 jest już rozwiązana, aktualną próbą dla tego dostępu jest próba 2
+    story_access, attempt = await get_attempt_progress(session, 1, mock_user)
 
-    # Sprawdzenie poprawności wyniku
-    assert (
-        story_access is not None
-    ), "StoryAccess should exist for the given user and attempt_id."
-    assert isinstance(
-        story_access, StoryAccess
-    ), "Returned object should be an instance of StoryAccess."
-    assert story_access.user.id == mock_user.id, "User ID should match the given user."
+    assert story_access.id == 1
+    assert attempt.id == 2, "Latest attempt of the access should be returned."
+    assert attempt.story_access_id == story_access.id
 
 
 @pytest.mark.asyncio
-async def test_get_story_access_by_attempt_nonexistent_attempt(
+async def test_get_attempt_progress_nonexistent_attempt(
     session: AsyncSession, mock_user: User
 ):
-    # Pobierz przykładowego użytkownika i nieistniejącą próbę
-    attempt_id = 9999  # Zakładamy, że takie attempt_id nie istnieje
-
-    # Wywołanie testowanej funkcji
     with pytest.raises(
-        EntityDoesNotExistError, match=f"Attempt with {attempt_id} id does not exist"
+        EntityDoesNotExistError, match="Attempt with 9999 id does not exist"
     ):
-        await get_story_access_by_attempt(
-            session, attempt_id=attempt_id, user=mock_user
-        )
+        await get_attempt_progress(session, 9999, mock_user)
 
 
 @pytest.mark.asyncio
-async def test_get_story_access_by_attempt_invalid_user(
+async def test_get_attempt_progress_invalid_user(
     session: AsyncSession, mock_user: User
 ):
-    # Pobierz przykładową próbę i użytkownika, który nie ma dostępu
-    attempt_id = 5  # Zakładamy, że attempt_id 1 istnieje w test_data.json
-
     with pytest.raises(
         UnAuthenticatedUserError, match="User doesn't have access to this attempt"
     ):
-        await get_story_access_by_attempt(session, attempt_id, mock_user)
+        await get_attempt_progress(session, 5, mock_user)
+
+
+@pytest.mark.asyncio
+async def test_get_access_progress_started(session: AsyncSession, mock_user: User):
+    # Użytkownik rozpoczął historię 1 i rozwiązał pierwszy etap
+    story_access, attempt = await get_access_progress(session, mock_user, 1)
+
+    assert story_access.id == 1
+    assert attempt.id == 2, "Latest attempt of the access should be returned."
+
+
+@pytest.mark.asyncio
+async def test_get_access_progress_purchased(session: AsyncSession, mock_user: User):
+    # Historia 3 jest kupiona, ale nie rozpoczęta
+    story_access, attempt = await get_access_progress(session, mock_user, 3)
+
+    assert story_access is not None
+    assert attempt is None
+
+
+@pytest.mark.asyncio
+async def test_get_access_progress_without_access(
+    session: AsyncSession, mock_user: User
+):
+    story_access, attempt = await get_access_progress(session, mock_user, 5)
+
+    assert story_access is None
+    assert attempt is None
@@ -1,6 +1,6 @@
 import pytest
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.db.models import User, Stage
+from app.db.models import User, Stage, Hint
 from app.db.db_queries import (
     get_instance,
     get_last_instance,
@@ -9,6 +9,9 @@ from app.db.db_queries import (
     get_instances,
     MultipleResultsException,
     get_first_instance,
+    create_instances,
+    _cached_select,
+    _filter_signature,
 )
 
 
@@ -194,3 +197,79 @@ async def test_get_first_instance(session: AsyncSession):
 
     assert stage.name == "First Challenge Indiana"
     assert stage.level == 1
+
+
+@pytest.mark.asyncio
+async def test_statement_is_reused_for_same_filter_signature(session: AsyncSession):
+    """Calls with the same model and filter keys share one cached statement."""
+    _cached_select.cache_clear()
+
+    await get_instance(session, User, username="user1")
+    await get_instance(session, User, username="user2")
+
+    cache_info = _cached_select.cache_info()
+    assert cache_info.misses == 1
+    assert cache_info.hits == 1
+
+
+@pytest.mark.asyncio
+async def test_get_instance_fetches_at_most_two_rows(session: AsyncSession):
+    """get_instance limits the query to two rows, which is enough to spot duplicates."""
+    stmt = _cached_select(User, _filter_signature({"is_active": True}), limit=2)
+    assert "LIMIT" in str(stmt)
+
+    with pytest.raises(MultipleResultsException):
+        await get_instance(session, User, is_active=True)
+
+
+@pytest.mark.asyncio
+async def test_get_instance_none_filter_uses_is_null(session: AsyncSession):
+    """A None filter value keeps the filter_by semantics and matches NULL columns."""
+    user = await get_instance(session, User, username="user2", gold=None)
+
+    assert user is not None
+    assert user.username == "user2"
+
+
+@pytest.mark.asyncio
+async def test_create_instances(session: AsyncSession):
+    """Test create_instances inserts all rows and returns instances in order."""
+    rows = [
+        {
+            "name": f"Bulk stage {level}",
+            "level": level,
+            "question": "question",
+            "password": "password",
+            "story_id": 9,
+        }
+        for level in range(1, 4)
+    ]
+    stages = await create_instances(session, Stage, rows)
+
+    assert [stage.name for stage in stages] == [row["name"] for row in rows]
+    assert all(stage.id is not None for stage in stages)
+    assert len(await get_instances(session, Stage, story_id=9)) == 3
+
+
+@pytest.mark.asyncio
+async def test_create_instances_primary_keys_without_commit(session: AsyncSession):
+    """Test create_instances returns primary keys and leaves the transaction open."""
+    rows = [
+        {"text": f"bulk hint {i}", "trigger": f"bulk trigger {i}", "stage_id": 1}
+        for i in range(3)
+    ]
+    hint_ids = await create_instances(
+        session, Hint, rows, commit=False, primary_keys_only=True
+    )
+
+    assert len(hint_ids) == 3
+    assert all(isinstance(hint_id, int) for hint_id in hint_ids)
+    assert session.in_transaction()
+    await session.rollback()
+    assert await get_instances(session, Hint, id=hint_ids) == []
+
+
+@pytest.mark.asyncio
+async def test_create_instances_empty_rows(session: AsyncSession):
+    """Test create_instances with no rows doesn't execute anything."""
+    assert await create_instances(session, Stage, []) == []
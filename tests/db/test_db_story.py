@@ -1,12 +1,22 @@
 import pytest
+from datetime import datetime
+from sqlalchemy import select, text
+from sqlalchemy.dialects import sqlite
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.db_story import (
     get_all_stories,
     get_story_by_id,
     create_story,
+    get_catalog_stories,
+    get_story_page,
+    get_story_facets,
+    StoryFilters,
+    _after_cursor,
+    _story_conditions,
 )
 from app.db.models import Story
-from app.schemas.story import StoryDisplay
+from app.db.catalog import StoryEntry
+from app.schemas.story import StoryDisplay, StorySortEnum
 
 
 @pytest.mark.asyncio
@@ -64,3 +74,119 @@ async def test_create_story(session):
     assert story.title == request.title
     assert story.description == request.description
     assert story.cost == request.cost
+
+
+@pytest.mark.asyncio
+async def test_create_story_refreshes_catalog(session: AsyncSession):
+    """
+    Test the catalog snapshot is rebuilt after a story is created.
+    Expected: The new story is returned by get_catalog_stories.
+    """
+    stories = await get_catalog_stories(session)
+    assert all(isinstance(story, StoryEntry) for story in stories)
+
+    request = StoryDisplay(
+        title="Catalog Adventure",
+        description="Story added after the snapshot was built.",
+        type="Adventure",
+        difficulty="Easy",
+        cost=10,
+    )
+    await create_story(session, request)
+
+    titles = [story.title for story in await get_catalog_stories(session)]
+    assert titles[: len(stories)] == [story.title for story in stories]
+    assert titles[-1] == "Catalog Adventure"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("descending", [False, True])
+@pytest.mark.parametrize("sort", list(StorySortEnum))
+async def test_get_story_page_walks_all_stories(
+    session: AsyncSession, sort: StorySortEnum, descending: bool
+):
+    """Following the cursors returns every story once, in the sort order."""
+    session.add(
+        Story(
+            title="Unrated",
+            description="No rating yet",
+            type="Test type",
+            difficulty="Easy",
+            rating=None,
+            cost=20,
+        )
+    )
+    await session.commit()
+    expected = (await session.execute(select(Story))).scalars().all()
+    # Rosnąco SQLite zwraca NULL na początku, malejąco na końcu
+    expected = sorted(
+        expected,
+        key=lambda story: (
+            getattr(story, sort.value) is not None,
+            getattr(story, sort.value) or 0,
+            story.id,
+        ),
+        reverse=descending,
+    )
+
+    stories, cursor = [], None
+    while True:
+        page, cursor = await get_story_page(
+            session,
+            StoryFilters(),
+            sort=sort,
+            descending=descending,
+            cursor=cursor,
+            limit=3,
+        )
+        stories.extend(page)
+        if cursor is None:
+            break
+
+    assert [story.id for story in stories] == [story.id for story in expected]
+
+
+@pytest.mark.asyncio
+async def test_get_story_page_filters_and_facets(session: AsyncSession):
+    """Filters limit the page, each facet is counted without its own filter."""
+    filters = StoryFilters(type="Adventure", min_cost=10, max_cost=100)
+    stories, cursor = await get_story_page(session, filters, sort=StorySortEnum.cost)
+
+    assert [story.title for story in stories] == [
+        "Adventure Story",
+        "Indiana jonse Story",
+    ]
+    assert cursor is None
+
+    facets = await get_story_facets(session, filters)
+    assert facets["type"] == {"Adventure": 2, "Test type": 4}
+    assert facets["difficulty"] == {"Medium": 1, "Hard": 1}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("descending", [False, True])
+@pytest.mark.parametrize(
+    "sort, value",
+    [("cost", 50), ("create_date", datetime(2024, 1, 1)), ("rating", 2.0)],
+)
+@pytest.mark.parametrize("filters", [StoryFilters(), StoryFilters(type="Adventure")])
+async def test_story_page_uses_index(
+    session: AsyncSession, sort: str, value, descending: bool, filters: StoryFilters
+):
+    """Every keyset condition of a deep page is an index range without a sort."""
+    column = getattr(Story, sort)
+    order = (column.desc(), Story.id.desc()) if descending else (column, Story.id)
+    for condition in _after_cursor(column, value, 5, descending):
+        stmt = (
+            select(Story)
+            .where(*_story_conditions(filters), condition)
+            .order_by(*order)
+            .limit(3)
+        )
+        sql = stmt.compile(
+            dialect=sqlite.dialect(), compile_kwargs={"literal_binds": True}
+        )
+        plan = await session.execute(text(f"EXPLAIN QUERY PLAN {sql}"))
+        details = " ".join(row[-1] for row in plan)
+        assert details.startswith("SEARCH story USING INDEX"), details
+        assert "TEMP B-TREE" not in details, details
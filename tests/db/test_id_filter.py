@@ -0,0 +1,58 @@
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.id_filter import IdFilter, attempt_ids
+from app.db.models import Attempt
+from app.db.query_stats import start_query_stats
+from app.db.storymanager import StoryManager
+
+
+@pytest.mark.asyncio
+async def test_unknown_ids_are_rejected_without_queries(session: AsyncSession):
+    """After the first load ids are answered from the bitmap and negative cache."""
+    id_filter = IdFilter(Attempt, near_window=100)
+    assert await id_filter.might_exist(session, 2)
+
+    stats = start_query_stats()
+    assert await id_filter.might_exist(session, 1)
+    assert not await id_filter.might_exist(session, 0)
+    assert stats.count == 0
+
+    for id_ in range(1000, 1100):
+        assert not await id_filter.might_exist(session, id_)
+    assert stats.count == 0, "Ids far above the bound wait for the reload interval."
+
+    id_filter.reload_interval = 0
+    assert not await id_filter.might_exist(session, 999)
+    assert (
+        stats.count == 1
+    ), "Id above the bound loads new ids once the interval passed."
+
+
+@pytest.mark.asyncio
+async def test_ids_near_the_bound_always_reload(session: AsyncSession):
+    """Rows inserted by another process are found right away, a valid id never 404s."""
+    id_filter = IdFilter(Attempt, near_window=100)
+    assert await id_filter.might_exist(session, 1)
+
+    # Filtr nie widzi wstawień tej sesji, jak wstawień innego procesu
+    attempt = Attempt(story_access_id=(await session.get(Attempt, 1)).story_access_id)
+    session.add(attempt)
+    await session.commit()
+
+    stats = start_query_stats()
+    assert await id_filter.might_exist(session, attempt.id)
+    assert stats.count == 1
+
+
+@pytest.mark.asyncio
+async def test_flushed_attempts_are_added(story_manager: StoryManager):
+    """Attempts created by this process pass the filter without a reload."""
+    await story_manager.load_by_story_id(8)
+    assert not await attempt_ids.might_exist(story_manager.db, 999)
+
+    await story_manager.start_story()
+    new_id = story_manager.current_attempt.id
+
+    stats = start_query_stats()
+    assert await attempt_ids.might_exist(story_manager.db, new_id)
+    assert stats.count == 0
@@ -0,0 +1,20 @@
+from app.db.catalog import HintEntry
+from app.db.matcher import normalize_text, build_stage_matcher
+
+
+def test_normalize_text_folds_case_whitespace_and_diacritics():
+    assert normalize_text("  Zażółć  GĘŚLĄ\tjaźń  Łódź ") == "zazolc gesla jazn lodz"
+
+
+def test_stage_matcher_answers_and_triggers():
+    hints = [
+        HintEntry(id=1, text="first", trigger="Daj wskazówkę", stage_id=1),
+        HintEntry(id=2, text="second", trigger="daj  wskazowke", stage_id=1),
+    ]
+    matcher = build_stage_matcher(["Żółw"], hints)
+
+    assert matcher.is_answer("ZOLW ")
+    assert not matcher.is_answer("zolwie")
+    # Pierwsza wskazówka wygrywa przy takim samym znormalizowanym wyzwalaczu
+    assert matcher.get_hint("DAJ WSKAZÓWKĘ").id == 1
+    assert matcher.get_hint("inna odpowiedz") is None
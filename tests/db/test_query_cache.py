@@ -0,0 +1,54 @@
+import pytest
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.db_queries import get_instances, add_instance
+from app.db.models import Hint
+from app.db.query_cache import QueryCache
+from app.db.query_stats import start_query_stats
+from tests.conftest import AsyncSessionLocal
+
+
+@pytest.mark.asyncio
+async def test_cached_result_is_reused_by_other_sessions(session: AsyncSession):
+    """The second identical cached query doesn't execute SQL."""
+    hints = await get_instances(session, Hint, cached=True, stage_id=2)
+
+    stats = start_query_stats()
+    async with AsyncSessionLocal() as other_session:
+        cached_hints = await get_instances(other_session, Hint, cached=True, stage_id=2)
+        assert [hint.trigger for hint in cached_hints] == [
+            hint.trigger for hint in hints
+        ]
+        assert all(hint in other_session for hint in cached_hints)
+    assert stats.count == 0
+
+
+@pytest.mark.asyncio
+async def test_flush_and_update_invalidate_cached_results(session: AsyncSession):
+    """Writes to the table, flushed or executed as statements, drop cached results."""
+    hints = await get_instances(session, Hint, cached=True, stage_id=2)
+
+    await add_instance(session, Hint, stage_id=2, text="new", trigger="new hint")
+    await session.commit()
+    hints_after_insert = await get_instances(session, Hint, cached=True, stage_id=2)
+    assert len(hints_after_insert) == len(hints) + 1
+
+    await session.execute(
+        update(Hint).where(Hint.trigger == "new hint").values(text="changed")
+    )
+    await session.commit()
+    stats = start_query_stats()
+    await get_instances(session, Hint, cached=True, stage_id=2)
+    assert stats.count == 1, "Updated table should be queried again."
+
+
+def test_query_cache_size_and_ttl():
+    query_cache = QueryCache(maxsize=1)
+    query_cache.set("first", [1], ["hint"], query_cache.generation)
+    query_cache.set("second", [2], ["hint"], query_cache.generation)
+    assert query_cache.get("first") is None, "The oldest result should be evicted."
+    assert query_cache.get("second") == (2,)
+
+    query_cache = QueryCache(ttl=0)
+    query_cache.set("first", [1], ["hint"], query_cache.generation)
+    assert query_cache.get("first") is None, "Expired result shouldn't be served."
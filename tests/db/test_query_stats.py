@@ -0,0 +1,63 @@
+import logging
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import query_stats
+from app.db.models import User
+from app.db.db_queries import get_instance
+from app.db.query_stats import start_query_stats, check_query_budget
+
+
+@pytest.mark.asyncio
+async def test_query_stats_counts_statements(session: AsyncSession):
+    """Statements executed in the context are counted and repeated ones detected."""
+    stats = start_query_stats()
+
+    await get_instance(session, User, username="user1")
+    await get_instance(session, User, username="user1")
+    await get_instance(session, User, username="user2")
+
+    assert stats.count == 3
+    assert stats.repeated == 1, "The same statement with same parameters repeats."
+    assert stats.total_time > 0
+
+
+@pytest.mark.asyncio
+async def test_check_query_budget_warns(session: AsyncSession, caplog):
+    """Exceeding the budget logs a warning with the endpoint name."""
+    stats = start_query_stats()
+    await get_instance(session, User, username="user1")
+    await get_instance(session, User, username="user2")
+
+    with caplog.at_level(logging.WARNING, logger="app.db.query_stats"):
+        assert check_query_budget(stats, "GET /story/", budget=1) is False
+    assert "GET /story/ executed 2 SQL statements" in caplog.text
+    assert check_query_budget(stats, "GET /story/", budget=2) is True
+
+
+@pytest.mark.asyncio
+async def test_query_stats_headers_in_debug_mode(
+    async_client: AsyncClient, authorized_headers: dict, monkeypatch
+):
+    """In debug mode the response carries query statistics headers."""
+    monkeypatch.setattr(query_stats, "QUERY_STATS_HEADERS", True)
+
+    response = await async_client.post(
+        "/attempt/2/check_password",
+        headers=authorized_headers,
+        json={"password": "wrong_password"},
+    )
+
+    assert response.status_code == 200
+    assert int(response.headers["X-DB-Query-Count"]) > 0
+    assert "X-DB-Query-Time-Ms" in response.headers
+    assert "X-DB-Repeated-Queries" in response.headers
+
+
+@pytest.mark.asyncio
+async def test_query_stats_headers_hidden_by_default(async_client: AsyncClient):
+    """Without debug mode no statistics headers are sent."""
+    response = await async_client.get("/story/")
+
+    assert response.status_code == 200
+    assert "X-DB-Query-Count" not in response.headers
@@ -0,0 +1,58 @@
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.db_story import create_story
+from app.db.search import build_match_query, highlight, search_stories
+from app.schemas.story import StoryDisplay
+
+
+def test_build_match_query_quotes_words():
+    assert build_match_query('chess "OR" NEAR(x') == '"chess" "OR" "NEAR" "x"*'
+    assert build_match_query(" -* ") is None
+
+
+def test_highlight_escapes_html():
+    assert highlight("<b>\x02Chess\x03</b>") == "&lt;b&gt;<mark>Chess</mark>&lt;/b&gt;"
+
+
+@pytest.mark.asyncio
+async def test_search_stories_ranks_title_matches_first(session: AsyncSession):
+    hits = await search_stories(session, "treas")
+    assert [hit.story_id for hit in hits] == [2]
+    assert "<mark>treasure</mark>" in hits[0].description_snippet
+
+    hits = await search_stories(session, "chess")
+    assert [hit.story_id for hit in hits] == [3, 4, 5]
+    assert hits[0].title_snippet == "<mark>Chess</mark> Story"
+
+    page = await search_stories(session, "story", offset=2, limit=3)
+    all_hits = await search_stories(session, "story", limit=100)
+    assert page == all_hits[2:5]
+
+
+@pytest.mark.asyncio
+async def test_search_index_follows_story_writes(session: AsyncSession):
+    story = await create_story(
+        session,
+        StoryDisplay(
+            title="Zamek",
+            description="Zagadka w zamku pełnym pajęczyn",
+            type="mystery",
+            difficulty="Hard",
+            cost=10,
+        ),
+    )
+    # Wyszukiwanie ignoruje polskie znaki diakrytyczne
+    assert [hit.story_id for hit in await search_stories(session, "pajeczyn")] == [
+        story.id
+    ]
+
+    story.title = "Twierdza"
+    await session.commit()
+    assert await search_stories(session, "zamek") == []
+    assert [hit.story_id for hit in await search_stories(session, "twierdza")] == [
+        story.id
+    ]
+
+    await session.delete(story)
+    await session.commit()
+    assert await search_stories(session, "twierdza") == []
@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.catalog import catalog
+from app.db.query_stats import start_query_stats
+from app.db.singleflight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_execution():
+    """Calls with the same key made while one is in flight share its result."""
+    single_flight = SingleFlight()
+    calls = []
+
+    async def load():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return len(calls)
+
+    results = await asyncio.gather(*(single_flight.do("key", load) for _ in range(5)))
+
+    assert results == [1] * 5
+    assert await single_flight.do("key", load) == 2, "Finished calls aren't reused."
+
+
+@pytest.mark.asyncio
+async def test_error_is_raised_to_every_caller():
+    single_flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("failed")
+
+    results = await asyncio.gather(
+        single_flight.do("key", fail),
+        single_flight.do("key", fail),
+        return_exceptions=True,
+    )
+
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_catalog_rebuilds_execute_once(session: AsyncSession):
+    """Concurrent readers of an invalidated catalog share one rebuild."""
+    catalog.invalidate()
+    stats = start_query_stats()
+
+    snapshots = await asyncio.gather(*(catalog.get_snapshot(session) for _ in range(5)))
+
+    assert all(snapshot is snapshots[0] for snapshot in snapshots)
+    assert stats.count == 4
+
+
+@pytest.mark.asyncio
+async def test_cancelled_first_caller_does_not_break_shared_rebuild(
+    session: AsyncSession,
+):
+    """The rebuild runs in its own session, so cancelling the request that started it is safe."""
+    catalog.invalidate()
+
+    first = asyncio.ensure_future(catalog.get_snapshot(session))
+    await asyncio.sleep(0)
+    second = asyncio.ensure_future(catalog.get_snapshot(session))
+    await asyncio.sleep(0)
+    first.cancel()
+    await session.close()
+
+    snapshot = await second
+
+    assert first.cancelled()
+    assert snapshot.version == catalog.version
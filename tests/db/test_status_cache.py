@@ -0,0 +1,138 @@
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.models import User
+from app.db.query_stats import start_query_stats
+from redis.exceptions import RedisError
+from app.db.status_cache import StoryStatusCache
+from app.db.storymanager import StoryManager
+from app.schemas.access import StatusEnum, StoryStatus
+
+
+@pytest.mark.asyncio
+async def test_get_story_status_is_served_from_cache(
+    session: AsyncSession, mock_user: User, override_get_status_cache
+):
+    """The first check loads the status, the next one doesn't execute SQL."""
+    story_manager = StoryManager(
+        session, mock_user, status_cache=override_get_status_cache
+    )
+    status = await story_manager.get_story_status(1)
+    assert status.status == StatusEnum.started
+
+    stats = start_query_stats()
+    cached_status = await StoryManager(
+        session, mock_user, status_cache=override_get_status_cache
+    ).get_story_status(1)
+
+    assert cached_status == status
+    assert stats.count == 0
+
+
+@pytest.mark.asyncio
+async def test_mutations_write_status_through(
+    session: AsyncSession, mock_user: User, override_get_status_cache
+):
+    """buy_story, start_story and a correct answer replace the cached status."""
+    status_cache = override_get_status_cache
+    story_manager = StoryManager(session, mock_user, status_cache=status_cache)
+    await story_manager.get_story_status(6)
+    assert (await status_cache.get(mock_user.id, 6)).status == StatusEnum.new
+
+    await story_manager.buy_story()
+    assert (await status_cache.get(mock_user.id, 6)).status == StatusEnum.purchased
+
+    await story_manager.start_story()
+    started = await status_cache.get(mock_user.id, 6)
+    assert started.status == StatusEnum.started
+    assert started.story_access.current_attempt.id == story_manager.current_attempt.id
+
+    story_manager = StoryManager(session, mock_user, status_cache=status_cache)
+    await story_manager.load_by_attempt_id(2)
+    result = await story_manager.validate_password("seek2")
+    next_status = await status_cache.get(mock_user.id, 1)
+    assert next_status.story_access.current_attempt.id == result.next_attempt
+
+
+@pytest.mark.asyncio
+async def test_fill_does_not_overwrite_written_status(
+    mock_user: User, override_get_status_cache: StoryStatusCache
+):
+    """A status loaded before a mutation can't replace the status it wrote."""
+    status_cache = override_get_status_cache
+    await status_cache.set(
+        mock_user.id, 3, StoryStatus(status=StatusEnum.started, story_access=None)
+    )
+    await status_cache.fill(
+        mock_user.id, 3, StoryStatus(status=StatusEnum.purchased, story_access=None)
+    )
+
+    assert (await status_cache.get(mock_user.id, 3)).status == StatusEnum.started
+
+
+@pytest.mark.asyncio
+async def test_owned_stories_bitset_is_cached(
+    session: AsyncSession, mock_user: User, override_get_status_cache
+):
+    """The bitset is built once from StoryAccess and rebuilt after a purchase."""
+    story_manager = StoryManager(
+        session, mock_user, status_cache=override_get_status_cache
+    )
+    owned = await story_manager.get_owned_stories()
+    assert owned >> 1 & 1 and not owned >> 6 & 1
+
+    stats = start_query_stats()
+    assert await story_manager.get_owned_stories() == owned
+    assert stats.count == 0
+
+    await story_manager.load_by_story_id(6)
+    await story_manager.buy_story()
+    assert (await story_manager.get_owned_stories()) >> 6 & 1
+
+
+@pytest.mark.asyncio
+async def test_get_story_statuses_loads_misses_with_one_query(
+    session: AsyncSession, mock_user: User, override_get_status_cache
+):
+    """Cached statuses are reused, the rest is loaded with one query and cached."""
+    story_manager = StoryManager(
+        session, mock_user, status_cache=override_get_status_cache
+    )
+    cached = await story_manager.get_story_status(1)
+
+    stats = start_query_stats()
+    statuses = await story_manager.get_story_statuses([6, 1, 3, 4, 3])
+    assert stats.count == 1
+    assert list(statuses) == [6, 1, 3, 4]
+    assert statuses[1] == cached
+    assert [status.status for status in statuses.values()] == [
+        StatusEnum.new,
+        StatusEnum.started,
+        StatusEnum.purchased,
+        StatusEnum.ended,
+    ]
+    assert statuses[4] == await StoryManager(session, mock_user).get_story_status(4)
+
+    stats = start_query_stats()
+    assert await story_manager.get_story_statuses([6, 1, 3, 4]) == statuses
+    assert stats.count == 0
+
+
+@pytest.mark.asyncio
+async def test_failed_write_through_drops_the_old_status(
+    mock_user: User, override_get_status_cache, mocker
+):
+    """When set() can't write the new status, the old one isn't served any more."""
+    status_cache = override_get_status_cache
+    await status_cache.fill(
+        mock_user.id, 3, StoryStatus(status=StatusEnum.purchased, story_access=None)
+    )
+
+    mocker.patch(
+        "redis.asyncio.client.Pipeline.execute", side_effect=RedisError("write failed")
+    )
+    await status_cache.set(
+        mock_user.id, 3, StoryStatus(status=StatusEnum.started, story_access=None)
+    )
+    mocker.stopall()
+
+    assert await status_cache.get(mock_user.id, 3) is None
@@ -1,6 +1,10 @@
 import pytest
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.storymanager import StoryManager
+from app.db.models import Story, User
+from app.db.catalog import catalog
+from tests.conftest import AsyncSessionLocal
+from app.db.query_stats import start_query_stats
 from app.schemas.access import StatusEnum, StoryStatus, StoryAccessBase, AttemptBase
 from app.schemas.attempt import HintBase, HintsDisplay, PasswordCheckDisplay
 
@@ -584,3 +588,95 @@ async def test_validate_password_trigger_hint(story_manager: StoryManager):
         result.next_attempt is None
     ), "next_attempt should be None when a hint is triggered."
     assert not result.end_story, "end_story should be False when a hint is triggered."
+
+
+@pytest.mark.asyncio
+async def test_validate_password_commits_once(
+    story_manager: StoryManager, session: AsyncSession, mocker
+):
+    """
+    Test validate_password writes the password, finished attempt and next attempt
+    in a single commit without refreshing them.
+    """
+    await story_manager.load_by_attempt_id(2)
+    commit_spy = mocker.spy(session, "commit")
+    refresh_spy = mocker.spy(session, "refresh")
+
+    result = await story_manager.validate_password("seek2")
+
+    assert result.next_attempt == 8, "next_attempt should be set after the commit."
+    assert commit_spy.call_count == 1, "Validation should be committed once."
+    assert refresh_spy.call_count == 0, "No refresh should be needed."
+    assert story_manager.current_attempt.finish_date is not None
+
+
+@pytest.mark.asyncio
+async def test_read_only_load_uses_read_session(session: AsyncSession, mock_user: User):
+    """
+    Test that read-only loads go through the read session and mutations keep the writer.
+    """
+    async with AsyncSessionLocal() as read_session:
+        story_manager = StoryManager(session, mock_user, read_session=read_session)
+        await story_manager.load_by_story_id(1, read_only=True)
+
+        assert story_manager.story_access in read_session
+        assert story_manager.story_access not in session
+
+        await story_manager.load_by_attempt_id(2)
+        assert story_manager.current_attempt in session
+
+
+@pytest.mark.asyncio
+async def test_validate_password_ignores_case_whitespace_and_diacritics(
+    story_manager: StoryManager,
+):
+    """
+    Test validate_password accepts the answer typed with different case, spacing
+    and Polish diacritics.
+    """
+    await story_manager.load_by_attempt_id(4)
+    result = await story_manager.validate_password("  TRĘASURE   2 ")
+
+    assert result.end_story, "Normalized answer should end the story."
+
+
+@pytest.mark.asyncio
+async def test_validate_password_wrong_guess_reads_nothing(
+    story_manager: StoryManager,
+):
+    """
+    Test a wrong guess which doesn't trigger a hint is resolved without reads.
+    """
+    await story_manager.load_by_attempt_id(2)
+    stats = start_query_stats()
+
+    result = await story_manager.validate_password("definitely wrong")
+
+    assert not result.new_hint
+    selects = [
+        statement
+        for statement, _ in stats.statements
+        if statement.lstrip().upper().startswith("SELECT")
+    ]
+    assert selects == [], "Wrong guess shouldn't execute any SELECT."
+
+
+@pytest.mark.asyncio
+async def test_load_story_reloads_catalog_on_miss(
+    story_manager: StoryManager, session: AsyncSession, monkeypatch
+):
+    """A story created by another worker is found without waiting for invalidation."""
+    monkeypatch.setattr(catalog, "miss_reload_interval", 0)
+    await catalog.get_snapshot(session)
+    story = Story(
+        title="Other worker",
+        description="Created elsewhere",
+        type="Adventure",
+        difficulty="Easy",
+        cost=1,
+    )
+    session.add(story)
+    await session.commit()
+
+    await story_manager.load_story(story.id)
+    assert story_manager.story.title == "Other worker"
@@ -0,0 +1,70 @@
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.db_story import add_story_tags, get_stories_by_tags
+from app.db.query_stats import start_query_stats
+from app.db.tag_query import (
+    MAX_TAG_QUERY_DEPTH,
+    tokenize_tag_query,
+    evaluate_tag_query,
+)
+from app.exceptions.exceptions import InvalidTagQueryError, UnAuthenticatedUserError
+
+BITMAPS = {"horror": 0b0111, "easy": 0b0101, "hard": 0b1010}
+
+
+def evaluate(query: str) -> int:
+    return evaluate_tag_query(tokenize_tag_query(query), BITMAPS.get, 0b1111)
+
+
+def test_operator_precedence_and_parentheses():
+    assert evaluate("horror AND NOT easy") == 0b0010
+    assert evaluate("easy OR hard AND horror") == 0b0111
+    assert evaluate("(easy OR hard) AND NOT horror") == 0b1000
+
+
+def test_operators_ignore_case_and_quoted_tags_may_contain_spaces():
+    bitmaps = {**BITMAPS, "test type": 0b0011, "and": 0b1000}
+    resolve = lambda tag: bitmaps.get(tag.lower(), 0)
+
+    tokens = tokenize_tag_query('"Test type" and not easy Or "and"')
+    assert evaluate_tag_query(tokens, resolve, 0b1111) == 0b1010
+
+
+@pytest.mark.parametrize(
+    "query",
+    [
+        "horror AND",
+        "(horror",
+        "horror easy",
+        "AND",
+        "",
+        '"horror',
+        "NOT " * (MAX_TAG_QUERY_DEPTH + 1) + "horror",
+        "(" * (MAX_TAG_QUERY_DEPTH + 1) + "horror" + ")" * (MAX_TAG_QUERY_DEPTH + 1),
+        " OR ".join(["horror"] * 100),
+    ],
+)
+def test_invalid_queries_are_rejected(query: str):
+    with pytest.raises(InvalidTagQueryError):
+        evaluate(query)
+
+
+@pytest.mark.asyncio
+async def test_get_stories_by_tags(session: AsyncSession):
+    """Tags, type and difficulty are queried from the snapshot without SQL."""
+    await add_story_tags(session, 1, ["Horror"])
+    await add_story_tags(session, 3, ["horror", "chess"])
+
+    stories = await get_stories_by_tags(session, "horror AND easy")
+    assert [story.id for story in stories] == [3]
+
+    async def load_owned() -> int:
+        return 1 << 1
+
+    stats = start_query_stats()
+    stories = await get_stories_by_tags(session, "HORROR AND NOT owned", load_owned)
+    assert [story.id for story in stories] == [3]
+    assert stats.count == 0
+
+    with pytest.raises(UnAuthenticatedUserError):
+        await get_stories_by_tags(session, "NOT owned")
@@ -0,0 +1,164 @@
+import asyncio
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.models import PasswordAttempt, Story, User
+from app.db.db_queries import add_instance, get_instances
+from app.db.writer import WriteExecutor
+from app.db.query_stats import start_query_stats
+from app.db.storymanager import StoryManager
+from app.schemas.access import StatusEnum
+from app.exceptions.exceptions import StoryAlreadyOwnedError
+from tests.conftest import AsyncSessionLocal
+
+
+def story_work(title: str):
+    async def work(session: AsyncSession):
+        story = await add_instance(
+            session,
+            Story,
+            title=title,
+            description="written by the writer task",
+            type="Adventure",
+            difficulty="Easy",
+            cost=1,
+        )
+        return story.title
+
+    return work
+
+
+@pytest.mark.asyncio
+async def test_concurrent_works_are_group_committed(session: AsyncSession, mocker):
+    """Works queued at the same time are written with a single commit."""
+    executor = WriteExecutor(AsyncSessionLocal)
+    commit_spy = mocker.spy(AsyncSession, "commit")
+
+    results = await asyncio.gather(
+        *(executor.submit(story_work(f"Group story {i}")) for i in range(5))
+    )
+    await executor.stop()
+
+    assert results == [f"Group story {i}" for i in range(5)]
+    assert commit_spy.call_count == 1, "All works should share one commit."
+    stories = await get_instances(
+        session, Story, title=[f"Group story {i}" for i in range(5)]
+    )
+    assert len(stories) == 5
+
+
+@pytest.mark.asyncio
+async def test_failing_work_does_not_affect_batch(session: AsyncSession):
+    """An error is raised only to its caller, other works of the batch are written."""
+    executor = WriteExecutor(AsyncSessionLocal)
+
+    async def failing_work(session: AsyncSession):
+        await story_work("Rolled back story")(session)
+        raise ValueError("Mocked failure")
+
+    results = await asyncio.gather(
+        executor.submit(story_work("First batch story")),
+        executor.submit(failing_work),
+        executor.submit(story_work("Second batch story")),
+        return_exceptions=True,
+    )
+    await executor.stop()
+
+    assert results[0] == "First batch story"
+    assert isinstance(results[1], ValueError)
+    assert results[2] == "Second batch story"
+    titles = {story.title for story in await get_instances(session, Story)}
+    assert "First batch story" in titles
+    assert "Second batch story" in titles
+    assert "Rolled back story" not in titles
+
+
+@pytest.mark.asyncio
+async def test_story_manager_buys_story_through_writer(
+    session: AsyncSession, mock_user: User
+):
+    """StoryManager mutations are executed by the writer and update its state."""
+    executor = WriteExecutor(AsyncSessionLocal)
+    story_manager = StoryManager(session, mock_user, writer=executor)
+
+    await story_manager.load_by_story_id(6)
+    await story_manager.buy_story()
+
+    assert story_manager.user.gold == 950
+    assert story_manager.story_access.id is not None
+    assert story_manager.story_status == StatusEnum.purchased
+
+    # Druga próba zakupu narusza unikalny indeks (user_id, story_id)
+    story_manager.story_access = None
+    with pytest.raises(StoryAlreadyOwnedError):
+        await story_manager.buy_story()
+    await executor.stop()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_guesses_record_the_hint_once(
+    session: AsyncSession, mock_user: User
+):
+    """Both guesses are written, only the first one reports the hint as new."""
+    executor = WriteExecutor(AsyncSessionLocal)
+    managers = []
+    for _ in range(2):
+        story_manager = StoryManager(session, mock_user, writer=executor)
+        await story_manager.load_by_attempt_id(2)
+        managers.append(story_manager)
+
+    results = await asyncio.gather(
+        *(manager.validate_password("give me hint 5") for manager in managers)
+    )
+    await executor.stop()
+
+    assert sorted(result.new_hint for result in results) == [False, True]
+    password_attempts = await get_instances(
+        session, PasswordAttempt, attempt_id=2, password="give me hint 5"
+    )
+    assert len(password_attempts) == 2
+
+
+@pytest.mark.asyncio
+async def test_writer_survives_failed_rollback_and_cancelled_work(
+    session: AsyncSession, mocker
+):
+    """Callers of a broken batch get an error and the writer keeps working."""
+    executor = WriteExecutor(AsyncSessionLocal)
+
+    async def cancelled_work(session: AsyncSession):
+        raise asyncio.CancelledError()
+
+    with pytest.raises(asyncio.CancelledError):
+        await executor.submit(cancelled_work)
+
+    async def failing_work(session: AsyncSession):
+        raise ValueError("work failed")
+
+    mocker.patch.object(
+        AsyncSession, "rollback", side_effect=RuntimeError("rollback failed")
+    )
+    with pytest.raises(RuntimeError):
+        await asyncio.wait_for(executor.submit(failing_work), timeout=1)
+    mocker.stopall()
+
+    assert await executor.submit(story_work("After failure")) == "After failure"
+    await executor.stop()
+
+
+@pytest.mark.asyncio
+async def test_writes_are_counted_for_the_calling_request(
+    session: AsyncSession, mock_user: User
+):
+    """Statements of the writer task count into the QueryStats of the caller."""
+    executor = WriteExecutor(AsyncSessionLocal)
+    story_manager = StoryManager(session, mock_user, writer=executor)
+    await story_manager.load_by_attempt_id(2)
+
+    stats = start_query_stats()
+    await story_manager.validate_password("definitely wrong")
+    await executor.stop()
+
+    assert any(
+        statement.startswith("INSERT INTO password_attempt")
+        for statement, _ in stats.statements
+    )
@@ -1,5 +1,8 @@
 import pytest
 from httpx import AsyncClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.catalog import catalog
 from tests.routers.test_login import login_and_get_token
 
 
@@ -352,3 +355,57 @@ async def test_password_validation_no_password_provided(
     assert response.status_code == 422, "Expected status code to be 422."
     data = response.json()
     assert "detail" in data, "Response should contain details about the error."
+
+
+@pytest.mark.asyncio
+async def test_get_attempt_conditional_get(
+    async_client: AsyncClient, authorized_headers: dict, session: AsyncSession
+):
+    """
+    Test the GET variant of /attempt/{id} sends validators and answers 304 to them.
+    """
+    response = await async_client.get("/attempt/2", headers=authorized_headers)
+    assert response.status_code == 200
+    assert response.json()["stage"]["name"] == "Second Challenge"
+    assert response.headers["cache-control"] == "private, no-cache"
+    assert "last-modified" not in response.headers, "Only the ETag validates."
+
+    etag = response.headers["etag"]
+
+    response = await async_client.get(
+        "/attempt/2",
+        headers={**authorized_headers, "If-None-Match": etag},
+    )
+    assert response.status_code == 304
+
+    # Hasło etapu nie wpływa na ETag, więc nie da się go z niego odgadnąć
+    await session.execute(text("UPDATE stage SET password = 'changed'"))
+    await session.commit()
+    catalog.invalidate()
+    response = await async_client.get("/attempt/2", headers=authorized_headers)
+    assert response.headers["etag"] == etag
+
+
+@pytest.mark.asyncio
+async def test_get_hints_conditional_get_changes_with_new_hint(
+    async_client: AsyncClient, authorized_headers: dict
+):
+    """
+    Test the ETag of /attempt/{id}/hints changes when a new hint is discovered.
+    """
+    response = await async_client.get("/attempt/2/hints", headers=authorized_headers)
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    conditional_headers = {**authorized_headers, "If-None-Match": etag}
+
+    response = await async_client.get("/attempt/2/hints", headers=conditional_headers)
+    assert response.status_code == 304
+
+    await async_client.post(
+        "/attempt/2/check_password",
+        json={"password": "give me hint 5"},
+        headers=authorized_headers,
+    )
+    response = await async_client.get("/attempt/2/hints", headers=conditional_headers)
+    assert response.status_code == 200, "New hint should change the ETag."
+    assert response.headers["etag"] != etag
@@ -1,3 +1,6 @@
+import base64
+import json
+
 import pytest
 from httpx import AsyncClient
 from sqlalchemy import text
@@ -306,3 +309,245 @@ async def test_check_access_ended(async_client: AsyncClient):
         data["story_access"]["purchase_date"]
         < data["story_access"]["current_attempt"]["finish_date"]
     )
+
+
+@pytest.mark.asyncio
+async def test_get_all_stories_etag_and_compression(async_client: AsyncClient):
+    """
+    Test the prebuilt story list is compressed and revalidated with its ETag.
+    """
+    response = await async_client.get("/story/", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    etag = response.headers["etag"]
+    assert response.json()[0]["title"] == "Adventure Story"
+
+    response = await async_client.get(
+        "/story/", headers={"Accept-Encoding": "gzip", "If-None-Match": etag}
+    )
+    assert response.status_code == 304, "Matching ETag should return 304."
+    assert response.content == b""
+
+    response = await async_client.get(
+        "/story/", headers={"Accept-Encoding": "identity", "If-None-Match": etag}
+    )
+    assert response.status_code == 200, "Each encoding has its own ETag."
+    assert "content-encoding" not in response.headers
+    assert response.headers["etag"] != etag
+
+    await async_client.post(
+        "/story/new/",
+        json={
+            "title": "New story",
+            "description": "New story description",
+            "type": "horror",
+            "difficulty": "easy",
+            "cost": 10,
+        },
+    )
+    response = await async_client.get("/story/", headers={"If-None-Match": etag})
+    assert response.status_code == 200, "Catalog change should change the ETag."
+    assert response.headers["etag"] != etag
+
+
+@pytest.mark.asyncio
+async def test_get_story_and_access_conditional_get(
+    async_client: AsyncClient, authorized_headers: dict
+):
+    """
+    Test the GET variants of /story/{id} and /story/{id}/access/ answer 304
+    to a matching ETag.
+    """
+    for url in ("/story/1", "/story/1/access/"):
+        response = await async_client.get(url, headers=authorized_headers)
+        assert response.status_code == 200
+        assert response.headers["cache-control"] == "private, no-cache"
+
+        response = await async_client.get(
+            url,
+            headers={**authorized_headers, "If-None-Match": response.headers["etag"]},
+        )
+        assert response.status_code == 304, f"{url} should answer 304."
+
+    response = await async_client.get("/story/1/access/", headers=authorized_headers)
+    assert response.json()["status"] == "started"
+
+
+@pytest.mark.asyncio
+async def test_access_conditional_get_follows_start(
+    async_client: AsyncClient, authorized_headers: dict
+):
+    """
+    Test starting a bought story changes the ETag of /story/{id}/access/, also when
+    it happens within the same second as the purchase.
+    """
+    response = await async_client.post("/story/6/buy/", headers=authorized_headers)
+    assert response.status_code == 200
+    response = await async_client.get("/story/6/access/", headers=authorized_headers)
+    assert response.status_code == 200
+    assert "last-modified" not in response.headers
+    etag = response.headers["etag"]
+
+    response = await async_client.post("/story/6/start/", headers=authorized_headers)
+    assert response.status_code == 200
+
+    response = await async_client.get(
+        "/story/6/access/",
+        headers={
+            **authorized_headers,
+            "If-None-Match": etag,
+            "If-Modified-Since": "Fri, 01 Jan 2100 00:00:00 GMT",
+        },
+    )
+    assert response.status_code == 200, "A started story isn't the bought one."
+    assert response.json()["status"] == "started"
+
+
+@pytest.mark.asyncio
+async def test_get_all_stories_with_ownership(
+    async_client: AsyncClient, authorized_headers: dict
+):
+    """
+    Test the story list marks owned stories and follows purchases.
+    """
+    response = await async_client.get("/story/owned/", headers=authorized_headers)
+    assert response.status_code == 200
+    owned = {story["id"]: story["owned"] for story in response.json()}
+    assert owned[1] and not owned[6]
+    etag = response.headers["etag"]
+
+    response = await async_client.get(
+        "/story/owned/", headers={**authorized_headers, "If-None-Match": etag}
+    )
+    assert response.status_code == 304
+
+    await async_client.post("/story/6/buy/", headers=authorized_headers)
+    response = await async_client.get(
+        "/story/owned/", headers={**authorized_headers, "If-None-Match": etag}
+    )
+    assert response.status_code == 200, "Purchase should change the ETag."
+    owned = {story["id"]: story["owned"] for story in response.json()}
+    assert owned[6]
+
+
+@pytest.mark.asyncio
+async def test_get_story_page(async_client: AsyncClient):
+    """
+    Test the paginated catalog returns a page, the next cursor and facet counts.
+    """
+    response = await async_client.get(
+        "/story/page/", params={"sort": "rating", "descending": True, "limit": 2}
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data["items"]) == 2
+    assert data["next_cursor"]
+    assert data["facets"]["difficulty"]["Easy"] == 8
+
+    response = await async_client.get(
+        "/story/page/",
+        params={"sort": "rating", "descending": True, "cursor": data["next_cursor"]},
+    )
+    assert response.status_code == 200
+    assert response.json()["items"][0]["id"] not in [
+        story["id"] for story in data["items"]
+    ]
+
+    response = await async_client.get("/story/page/", params={"cursor": "invalid"})
+    assert response.status_code == 400, "Invalid cursor should be rejected."
+
+    for sort, value in (("cost", [1]), ("rating", "5"), ("create_date", 1)):
+        cursor = base64.urlsafe_b64encode(json.dumps([value, 1]).encode()).decode()
+        response = await async_client.get(
+            "/story/page/", params={"sort": sort, "cursor": cursor}
+        )
+        assert response.status_code == 400, f"{value!r} isn't a {sort} cursor."
+
+
+@pytest.mark.asyncio
+async def test_query_stories_by_tags(
+    async_client: AsyncClient, authorized_headers: dict
+):
+    """
+    Test the tag query endpoint with the owned tag of the logged in user.
+    """
+    response = await async_client.get(
+        "/story/tags/",
+        params={"q": "easy AND NOT owned"},
+        headers=authorized_headers,
+    )
+    assert response.status_code == 200
+    assert [story["title"] for story in response.json()] == [
+        "No access Chess Story2",
+        "Story to buy",
+        "Story to buy to expensive",
+        "Story with no acces for user",
+    ]
+
+    response = await async_client.get("/story/tags/", params={"q": "NOT owned"})
+    assert response.status_code == 401
+
+    response = await async_client.get("/story/tags/", params={"q": "easy AND"})
+    assert response.status_code == 400
+
+    response = await async_client.get("/story/tags/", params={"q": "NOT " * 200})
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_search_stories(async_client: AsyncClient):
+    response = await async_client.get("/story/search/?q=logic&limit=2")
+    assert response.status_code == 200
+    page = response.json()
+    assert [item["id"] for item in page["items"]] == [3, 4]
+    assert page["items"][0]["description_snippet"] == (
+        "A <mark>logic</mark> puzzle story."
+    )
+    assert page["next_offset"] == 2
+
+    response = await async_client.get("/story/search/?q=logic&offset=2&limit=2")
+    page = response.json()
+    assert [item["id"] for item in page["items"]] == [5]
+    assert page["next_offset"] is None
+
+    response = await async_client.get("/story/search/?q=(")
+    assert response.status_code == 200
+    assert response.json() == {"items": [], "next_offset": None}
+
+
+@pytest.mark.asyncio
+async def test_autocomplete_story_titles(async_client: AsyncClient):
+    response = await async_client.get("/story/autocomplete/?q=che&limit=2")
+    assert response.status_code == 200
+    assert [story["id"] for story in response.json()] == [3, 4]
+
+    response = await async_client.get("/story/autocomplete/?q=chess story2")
+    assert [story["id"] for story in response.json()] == [4, 5]
+
+    response = await async_client.get("/story/autocomplete/?q=che&limit=100")
+    assert response.status_code == 422
+
+
+@pytest.mark.asyncio
+async def test_check_access_many(async_client: AsyncClient, authorized_headers):
+    response = await async_client.post(
+        "/story/access/", json={"story_ids": [1, 6]}, headers=authorized_headers
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert data["1"]["status"] == "started"
+    assert data["1"]["story_access"]["current_attempt"]["finish_date"] is None
+    assert data["6"] == {"status": "new", "story_access": None}
+
+    response = await async_client.post(
+        "/story/access/", json={"story_ids": [1, 999]}, headers=authorized_headers
+    )
+    assert response.status_code == 404
+
+    response = await async_client.post(
+        "/story/access/", json={"story_ids": []}, headers=authorized_headers
+    )
+    assert response.status_code == 422
+
+    response = await async_client.post("/story/access/", json={"story_ids": [1]})
+    assert response.status_code == 401
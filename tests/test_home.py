@@ -9,3 +9,13 @@ async def test_home(async_client):
     response = await async_client.get("/")  # Use 'await' to call async methods
     assert response.status_code == 200
     assert response.json() == {"message": "hello world"}
+
+
+@pytest.mark.asyncio
+async def test_db_profile_requires_superuser(async_client, authorized_headers):
+    """The database tuning state is not exposed to anonymous or regular users."""
+    response = await async_client.get("/db-profile")
+    assert response.status_code == 401
+
+    response = await async_client.get("/db-profile", headers=authorized_headers)
+    assert response.status_code == 403
@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+from app.db.models import User
+from app.users.auth import CachedRedisStrategy
+from app.users.manager import UserManager
+from app.users.user_cache import UserCache
+
+
+@pytest.mark.asyncio
+async def test_read_token_is_served_from_cache(
+    test_redis, user_manager: UserManager, mock_user: User, mocker
+):
+    """The second read of a token doesn't touch Redis nor the database."""
+    strategy = CachedRedisStrategy(test_redis, 3600, UserCache(test_redis))
+    token = await strategy.write_token(mock_user)
+
+    first = await strategy.read_token(token, user_manager)
+    get_spy = mocker.spy(user_manager, "get")
+    redis_spy = mocker.spy(test_redis, "get")
+    second = await strategy.read_token(token, user_manager)
+
+    assert second.id == first.id
+    assert second.gold == first.gold
+    assert second is not first, "Every hit should get its own User instance."
+    assert get_spy.call_count == 0
+    assert redis_spy.call_count == 0
+
+
+@pytest.mark.asyncio
+async def test_destroy_token_invalidates_cache(
+    test_redis, user_manager: UserManager, mock_user: User
+):
+    """A destroyed token can't be read from the cache."""
+    strategy = CachedRedisStrategy(test_redis, 3600, UserCache(test_redis))
+    token = await strategy.write_token(mock_user)
+    user = await strategy.read_token(token, user_manager)
+
+    await strategy.destroy_token(token, user)
+
+    assert await strategy.read_token(token, user_manager) is None
+
+
+@pytest.mark.asyncio
+async def test_invalidation_is_published_to_other_workers(test_redis, mock_user: User):
+    """Invalidations published by one cache are applied by the listening ones."""
+    publisher = UserCache(test_redis)
+    listener = UserCache(test_redis)
+    listener.set("token", mock_user, listener.generation)
+    listen_task = asyncio.create_task(listener.listen())
+    # Czas na subskrypcję kanału
+    await asyncio.sleep(0.1)
+
+    await publisher.invalidate_user(mock_user.id)
+    for _ in range(50):
+        if listener.get("token") is None:
+            break
+        await asyncio.sleep(0.01)
+    listen_task.cancel()
+
+    assert listener.get("token") is None
+
+
+@pytest.mark.asyncio
+async def test_user_loaded_before_invalidation_is_not_cached(
+    test_redis, mock_user: User
+):
+    """A user read before an invalidation of the same user isn't stored."""
+    user_cache = UserCache(test_redis, maxsize=1)
+    generation = user_cache.generation
+    await user_cache.invalidate_user(mock_user.id)
+    user_cache.set("token", mock_user, generation)
+    assert user_cache.get("token") is None
+
+    user_cache.set("token", mock_user, user_cache.generation)
+    user_cache.set("other", mock_user, user_cache.generation)
+    assert user_cache.get("token") is None, "The oldest token should be evicted."
+    assert user_cache.get("other").id == mock_user.id
+
+
+@pytest.mark.asyncio
+async def test_cached_user_does_not_outlive_its_token(
+    test_redis, user_manager: UserManager, mock_user: User
+):
+    """The entry expires together with the token even when the cache TTL is longer."""
+    user_cache = UserCache(test_redis, ttl=3600)
+    strategy = CachedRedisStrategy(test_redis, 3600, user_cache)
+    token = await strategy.write_token(mock_user)
+    await test_redis.pexpire(f"{strategy.key_prefix}{token}", 50)
+
+    assert await strategy.read_token(token, user_manager) is not None
+    assert user_cache.get(token) is not None
+    await asyncio.sleep(0.06)
+    assert user_cache.get(token) is None
+
+
+@pytest.mark.asyncio
+async def test_listener_survives_malformed_messages(test_redis, mock_user: User):
+    """A bad payload doesn't stop the listener from applying later invalidations."""
+    listener = UserCache(test_redis)
+    listen_task = asyncio.create_task(listener.listen())
+    await asyncio.sleep(0.1)
+
+    await test_redis.publish(listener.channel, "user:not-a-uuid")
+    # Po błędzie listener odnawia subskrypcję
+    await asyncio.sleep(1.2)
+    listener.set("token", mock_user, listener.generation)
+    await test_redis.publish(listener.channel, f"user:{mock_user.id}")
+    for _ in range(50):
+        if listener.get("token") is None:
+            break
+        await asyncio.sleep(0.01)
+    listen_task.cancel()
+
+    assert listener.get("token") is None